@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Render every record of a JSONL manifest through generate_copy.synthesize().
+
+One record per line, e.g.
+    {"id": "ivr-main-menu", "text": "Welcome. Press 1 for sales.", "voice": "Joanna", "engine": "neural"}
+    {"id": "ivr-hold", "ssml": "<speak>Please hold.<break time=\"300ms\"/></speak>", "format": "pcm"}
+Optional keys: voice, engine, format ("mp3" | "ogg_vorbis" | "pcm"), sample_rate, outpath.
+
+The manifest is streamed and at most --window records are in flight at once, so memory stays
+flat however many records there are. All workers share one --tps cap, in the scheduler's
+"bulk" class, so prompts served by the same process go first. Each record's outcome is
+appended to the results JSONL as soon as it finishes; a rerun appends after earlier results.
+
+    python batch_synthesize.py prompts.jsonl                      # results -> prompts.results.jsonl
+    python batch_synthesize.py prompts.jsonl --window 64 --workers 8 --tps 16 --skip-existing
+"""
+import argparse, json, os, re, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import generate_copy as gc
+
+BATCH_WINDOW = 32   # records submitted but not yet finished
+FORMAT_EXTENSIONS = {"mp3": "mp3", "ogg_vorbis": "ogg", "pcm": "pcm"}
+
+def read_manifest(path):
+    """Yield (line number, record or None, error or None) for each non-blank line of a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield lineno, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield lineno, None, "record is not a JSON object"
+                continue
+            yield lineno, record, None
+
+def plan_record(record, outdir):
+    """synthesize() keyword arguments for one manifest record; raises ValueError if it is unusable."""
+    rid = str(record.get("id") or "").strip()
+    if not rid:
+        raise ValueError("missing id")
+    if ("text" in record) == ("ssml" in record):
+        raise ValueError("exactly one of text or ssml is required")
+    text_type = "ssml" if "ssml" in record else "text"
+    output_format = record.get("format", gc.OUTPUT_FORMAT)
+    if output_format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"unsupported format {output_format!r}")
+    default_rate = gc.PCM_SOURCE_RATE if output_format == "pcm" else gc.SAMPLE_RATE
+    safe_id = re.sub(r"[^\w.-]+", "_", rid)
+    return {
+        "text": record[text_type],
+        "text_type": text_type,
+        "voice": record.get("voice", gc.BASELINE_VOICE),
+        "engine": record.get("engine", gc.BASELINE_ENGINE),
+        "output_format": output_format,
+        "sample_rate": str(record.get("sample_rate", default_rate)),
+        "outpath": record.get("outpath") or os.path.join(outdir, f"{safe_id}.{FORMAT_EXTENSIONS[output_format]}"),
+    }
+
+def run_batch(manifest, results_path, *, outdir, window=BATCH_WINDOW, workers=gc.GRID_WORKERS,
+              tps=gc.GRID_TPS, skip_existing=False):
+    """Synthesize every record of `manifest`, appending one result line per record to `results_path`."""
+    gc.ensure_dirs(outdir)
+    bucket = gc.POLLY_SCHEDULER.lane("bulk", max_rate=tps)
+    counts = {}
+
+    def _run(lineno, rid, job):
+        started = time.monotonic()
+        result = {"id": rid, "line": lineno, "outpath": job["outpath"]}
+        if skip_existing and os.path.exists(job["outpath"]):
+            return dict(result, status="skipped", seconds=0.0)
+        try:
+            gc.ensure_dirs(os.path.dirname(job["outpath"]) or ".")
+            # Parallelism comes from the batch window, so each record sends its segments in order;
+            # throttling is retried per request inside synthesize()
+            gc.synthesize(job["text"], text_type=job["text_type"], voice=job["voice"], engine=job["engine"],
+                          outpath=job["outpath"], output_format=job["output_format"],
+                          sample_rate=job["sample_rate"], concurrency=1, limiter=bucket)
+            return dict(result, status="ok", seconds=round(time.monotonic() - started, 3))
+        except Exception as e:
+            return dict(result, status="failed", seconds=round(time.monotonic() - started, 3), error=str(e))
+
+    def _write(out, result):
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+    started = time.monotonic()
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex, open(results_path, "a", encoding="utf-8") as out:
+        for lineno, record, error in read_manifest(manifest):
+            rid = record.get("id") if record else None
+            if error is None:
+                try:
+                    job = plan_record(record, outdir)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                _write(out, {"id": rid, "line": lineno, "status": "invalid", "error": error})
+                continue
+            # Bounded in-flight window: wait for a slot before reading further into the manifest
+            while len(pending) >= max(1, window):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    _write(out, fut.result())
+            pending.add(ex.submit(_run, lineno, rid, job))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                _write(out, fut.result())
+
+    elapsed = max(time.monotonic() - started, 1e-9)
+    total = sum(counts.values())
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"Batch finished: {total} record(s) ({summary}) in {elapsed:.1f}s | {total / elapsed:.2f} records/s | "
+          f"{bucket.acquired / elapsed:.2f} requests/s | throttled {bucket.throttled}x")
+    print("\n".join(gc.run_stats()))
+    print(f"Results: {results_path}")
+    return counts
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("manifest", help="JSONL file with one record per line")
+    ap.add_argument("--results", help="results JSONL (default: <manifest>.results.jsonl)")
+    ap.add_argument("--outdir", default=os.path.join(gc.OUTPUT_BASE_DIR, "batch"), help="where audio is written")
+    ap.add_argument("--window", type=int, default=BATCH_WINDOW, help="records in flight at once")
+    ap.add_argument("--workers", type=int, default=gc.GRID_WORKERS, help="threads synthesizing records")
+    ap.add_argument("--tps", type=float, default=gc.GRID_TPS, help="synthesize_speech requests/second, shared")
+    ap.add_argument("--skip-existing", action="store_true", help="leave records whose output file exists")
+    args = ap.parse_args()
+    results = args.results or f"{os.path.splitext(args.manifest)[0]}.results.jsonl"
+    gc._assert_aws_creds()
+    run_batch(args.manifest, results, outdir=args.outdir, window=args.window, workers=args.workers,
+              tps=args.tps, skip_existing=args.skip_existing)
+    if gc.CAPABILITY_STORE is not None:
+        gc.CAPABILITY_STORE.save()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the generate_copy.py pipeline. Nothing here calls AWS.
+
+  python benchmark.py split        # plain-text splitter scaling, 10 KB -> 50 MB
+  python benchmark.py sanitize     # single-pass SSML sanitizer vs the old regex chains
+  python benchmark.py load         # synthesize()/grid_synthesize() against fake_polly: segments/s, p50/p99, RSS
+  python benchmark.py load --latency-median 0.3 --latency-p99 2 --throttle-rate 0.05 --targets synthesize
+  python benchmark.py load --targets synthesize --hedge    # same, with hedged requests
+"""
+import argparse, contextlib, io, os, random, re, resource, shutil, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import fake_polly
+import generate_copy as gc
+
+SPLIT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000, 50_000_000]
+LEGACY_MAX_SIZE = 10_000_000   # the old splitter is only timed up to here
+
+def _legacy_split_plain_text(text: str, engine: str):
+    # split_plain_text() as it was before the single-pass rewrite; kept for comparison
+    lim = gc._limit(engine)
+    parts = []
+    sentences = re.split(r'(?<=[\.\!\?])\s+', text.strip())
+    buf = ""
+    for s in sentences:
+        s = s.strip()
+        if not s:
+            continue
+        candidate = (buf + " " + s).strip() if buf else s
+        if len(candidate) <= lim:
+            buf = candidate
+        else:
+            if buf: parts.append(buf)
+            if len(s) > lim:
+                chunks = re.split(r'(,|\s)', s)
+                sub = ""
+                for c in chunks:
+                    nxt = (sub + c)
+                    if len(nxt) > lim and sub:
+                        parts.append(sub)
+                        sub = c
+                    else:
+                        sub = nxt
+                if sub: parts.append(sub)
+                buf = ""
+            else:
+                buf = s
+    if buf: parts.append(buf)
+    return parts
+
+def _legacy_sanitize_ssml_for_neural(ssml_text: str) -> str:
+    # sanitize_ssml_for_neural() before the single-pass rewrite; kept for comparison
+    t = ssml_text
+    # Remove comments
+    t = re.sub(r"<!--.*?-->", "", t, flags=re.DOTALL)
+    # Strip all amazon:* tags but keep inner contents
+    t = re.sub(r"</?amazon:[^>]+>", "", t)
+    # Remove <mark .../>
+    t = re.sub(r"<mark[^>]*/>", "", t)
+    # Replace <phoneme ...>inner</phoneme> with inner
+    t = re.sub(r"<phoneme[^>]*>(.*?)</phoneme>", r"\1", t, flags=re.DOTALL)
+    # Drop pitch/volume in prosody; keep rate
+    def _strip_prosody_attrs(m):
+        attrs = m.group(1)
+        attrs = re.sub(r'\s+pitch="[^"]*"', "", attrs)
+        attrs = re.sub(r'\s+volume="[^"]*"', "", attrs)
+        return f"<prosody{attrs}>"
+    t = re.sub(r"<prosody([^>]*)>", _strip_prosody_attrs, t)
+    # Clamp breaks (100–400ms)
+    def _clamp_break(m):
+        try:
+            ms = max(100, min(int(m.group(1)), 400))
+        except Exception:
+            ms = 200
+        return f'<break time="{ms}ms"/>'
+    t = re.sub(r'<break\s+time="(\d+)ms"\s*/>', _clamp_break, t)
+    return t
+
+def _legacy_sanitize_ssml_for_neural_minimal(ssml_text: str) -> str:
+    t = ssml_text
+    # Remove comments and amazon:* wrappers
+    t = re.sub(r"<!--.*?-->", "", t, flags=re.DOTALL)
+    t = re.sub(r"</?amazon:[^>]+>", "", t)
+    # Remove phoneme entirely keeping inner text
+    t = re.sub(r"<phoneme[^>]*>(.*?)</phoneme>", r"\1", t, flags=re.DOTALL)
+    # Remove all prosody, emphasis, say-as and any other tags except speak/p/s/break
+    t = re.sub(r"</?(prosody|emphasis|say-as|sub|mark|audio|lang|w|voice)[^>]*>", "", t, flags=re.IGNORECASE)
+    # Normalize break tags, remove attributes except time and clamp
+    def _normalize_break(m):
+        try:
+            ms = max(100, min(int(m.group(1)), 400))
+        except Exception:
+            ms = 200
+        return f'<break time="{ms}ms"/>'
+    t = re.sub(r'<break[^>]*time="(\d+)ms"[^>]*/>', _normalize_break, t)
+    # Remove any other tags than speak/p/s/break
+    t = re.sub(r"<(?!/?(speak|p|s|break)\b)[^>]+>", "", t, flags=re.IGNORECASE)
+    # Ensure speak wrapper
+    inner = re.sub(r"^\s*<\s*speak\s*>", "", t.strip(), flags=re.IGNORECASE)
+    inner = re.sub(r"<\s*/\s*speak\s*>\s*$", "", inner, flags=re.IGNORECASE)
+    return f"<speak>{inner}</speak>"
+
+SANITIZE_SIZES = [100_000, 1_000_000, 10_000_000]
+
+# Tag-per-word markup in the style of "third try/generate.py"
+_DENSE_SSML = """
+    <amazon:effect name="drc"><amazon:auto-breaths volume="low" frequency="low" duration="short">
+    <!-- ==== NARRATOR ==== -->
+    <p><s><prosody rate="medium" pitch="+0st" volume="medium">
+      <emphasis level="reduced">One</emphasis> <emphasis level="reduced">day,</emphasis>
+      a rich <emphasis level="moderate">merchant</emphasis> came to
+      <phoneme alphabet="ipa" ph="ˈbɪərbʌl"><emphasis level="moderate">Birbal</emphasis></phoneme>.
+      <break time="900ms"/> He has <say-as interpret-as="cardinal">7</say-as> servants.<mark name="m1"/>
+    </prosody></s></p>
+    </amazon:auto-breaths></amazon:effect>
+"""
+
+# Narration with a few tags per paragraph
+_PROSE_SSML = (
+    "<p><s>" + "One day, a rich merchant came to Birbal and asked for help finding a thief. " * 6
+    + '<break time="900ms"/></s><s><prosody rate="fast" pitch="+2st">'
+    + "He said the servants were all scared. " * 4 + "</prosody></s></p>\n"
+)
+
+def _book_ssml(size, paragraph):
+    body = paragraph * (size // len(paragraph) + 1)
+    return f"<speak>{body}</speak>"
+
+def _book_text(size, seed=7):
+    """Story-like prose with the odd run-on paragraph that has no sentence punctuation."""
+    rng = random.Random(seed)
+    words = gc.TEXT_INPUT.split() + "the merchant Birbal servants stick pearls thief house".split()
+    out, n = [], 0
+    while n < size:
+        if rng.random() < 0.02:
+            piece = " ".join(rng.choice(words).strip(".?!") for _ in range(rng.randint(300, 900))) + ". "
+        else:
+            piece = " ".join(rng.choice(words) for _ in range(rng.randint(5, 25))).rstrip(".?!,") + rng.choice(".?!") + " "
+        if rng.random() < 0.1:
+            piece += "\n    "
+        out.append(piece)
+        n += len(piece)
+    return "".join(out)[:size]
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+def bench_split(args):
+    print(f"{'size':>10} {'chunks':>8} {'new s':>9} {'new MB/s':>9} {'old s':>9} {'old MB/s':>9}")
+    for size in args.sizes:
+        text = _book_text(size)
+        new_s, chunks = _timed(gc.split_plain_text, text, args.engine)
+        row = f"{size:>10,} {len(chunks):>8} {new_s:>9.3f} {size / new_s / 1e6:>9.1f}"
+        if size <= LEGACY_MAX_SIZE:
+            old_s, old_chunks = _timed(_legacy_split_plain_text, text, args.engine)
+            assert old_chunks == chunks, f"splitters disagree at {size} bytes"
+            row += f" {old_s:>9.3f} {size / old_s / 1e6:>9.1f}"
+        print(row)
+
+def bench_sanitize(args):
+    # The neural profile now follows SSML_CAPABILITIES (keeps <phoneme>, <mark>, prosody volume and drops
+    # <emphasis>), so only the minimal sanitizers still produce identical output
+    pairs = [("neural", _legacy_sanitize_ssml_for_neural, gc.sanitize_ssml_for_neural, False),
+             ("neural-minimal", _legacy_sanitize_ssml_for_neural_minimal, gc.sanitize_ssml_for_neural_minimal, True)]
+    print(f"{'corpus':>6} {'profile':>15} {'size':>11} {'old s':>8} {'old MB/s':>9} "
+          f"{'new s':>8} {'new MB/s':>9} {'speedup':>8}")
+    for corpus, paragraph in (("prose", _PROSE_SSML), ("dense", _DENSE_SSML)):
+        for size in args.sizes:
+            ssml = _book_ssml(size, paragraph)
+            for name, old, new, same in pairs:
+                old_s, old_out = _timed(old, ssml)
+                new_s, new_out = _timed(new, ssml)
+                assert old_out == new_out or not same, f"{name} sanitizers disagree on {corpus} at {size} bytes"
+                mb = len(ssml) / 1e6
+                print(f"{corpus:>6} {name:>15} {len(ssml):>11,} {old_s:>8.3f} {mb / old_s:>9.1f} "
+                      f"{new_s:>8.3f} {mb / new_s:>9.1f} {old_s / new_s:>7.1f}x")
+
+LOAD_PROMPTS = 200
+LOAD_THREADS = 8
+LOAD_SIZES = [120, 400, 1_200, 3_000, 8_000]   # prompt lengths in characters, drawn uniformly
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, KiB on Linux
+
+def _fake_backend(args):
+    # Fresh process state: fake audio and injected rejections must not reach the on-disk caches
+    polly = fake_polly.FakePolly(
+        latency=fake_polly.lognormal_latency(args.latency_median, args.latency_p99),
+        throttle_rate=args.throttle_rate, invalid_ssml_rate=args.invalid_ssml_rate,
+        max_inflight=args.max_inflight, seed=args.seed)
+    gc.set_polly_backend(polly)
+    gc.SEGMENT_CACHE = None
+    gc.CAPABILITY_STORE = None
+    return polly
+
+def _load_synthesize(args, outdir):
+    rng = random.Random(args.seed)
+    prompts = []
+    for i in range(args.prompts):
+        size = rng.choice(LOAD_SIZES)
+        if rng.random() < args.ssml_share:
+            prompts.append(("ssml", _book_ssml(size, _PROSE_SSML)))
+        else:
+            prompts.append(("text", _book_text(size, seed=i)))
+
+    def _one(job):
+        i, (kind, body) = job
+        started = time.perf_counter()
+        try:
+            gc.synthesize(body, text_type=kind, voice=args.voice, engine=args.engine,
+                          outpath=f"{outdir}/{kind}_{i}.{gc.OUTPUT_FORMAT}", hedge=args.hedge)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.threads) as ex:
+        latencies = list(ex.map(_one, enumerate(prompts)))
+    return len(prompts), [t for t in latencies if t is not None]
+
+def _load_grid(args, outdir):
+    text, ssml = _book_text(1_200), _book_ssml(1_200, _PROSE_SSML)
+    gc.grid_synthesize(text, ssml, language_code="en-US", outdir=outdir, workers=args.threads,
+                       tps=args.tps, ledger_path=None)
+    return 2 * sum(len(v.get("SupportedEngines") or []) for v in gc.list_voices("en-US")), []
+
+def _run_load(target, args):
+    """One load test in its own process, so peak RSS belongs to that target alone."""
+    polly = _fake_backend(args)
+    outdir = tempfile.mkdtemp(prefix=f"bench_{target}_")
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            jobs, latencies = (_load_synthesize if target == "synthesize" else _load_grid)(args, outdir)
+        elapsed = time.perf_counter() - started
+        written = sum(len(files) for _, _, files in os.walk(outdir))
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+    return {"target": target, "jobs": jobs, "failed": jobs - written,
+            "seconds": elapsed, "segments": polly.counts["served"], "counts": dict(polly.counts),
+            "latencies": latencies, "requests": list(polly.latencies), "rss": _peak_rss_mb(),
+            "retries": gc.retry_stats(), "hedging": gc.hedge_stats() if args.hedge else None}
+
+def bench_load(args):
+    print(f"fake Polly: latency p50 {args.latency_median * 1000:.0f} ms / p99 {args.latency_p99 * 1000:.0f} ms, "
+          f"throttle {args.throttle_rate:.1%}, InvalidSsml {args.invalid_ssml_rate:.1%}, {args.threads} threads")
+    print(f"{'target':>10} {'jobs':>5} {'failed':>6} {'seconds':>8} {'segments':>9} {'seg/s':>7} "
+          f"{'job p50':>8} {'job p99':>8} {'req p50':>8} {'req p99':>8} {'peak RSS':>9}")
+    for target in args.targets:
+        with ProcessPoolExecutor(max_workers=1) as ex:
+            r = ex.submit(_run_load, target, args).result()
+        jobs = f"{_percentile(r['latencies'], 50):>7.3f}s {_percentile(r['latencies'], 99):>7.3f}s" \
+            if r["latencies"] else f"{'-':>8} {'-':>8}"
+        print(f"{target:>10} {r['jobs']:>5} {r['failed']:>6} {r['seconds']:>8.2f} "
+              f"{r['segments']:>9} {r['segments'] / r['seconds']:>7.1f} {jobs} "
+              f"{_percentile(r['requests'], 50):>7.3f}s {_percentile(r['requests'], 99):>7.3f}s {r['rss']:>7.1f}MB")
+        print(f"{'':>10} fake Polly {r['counts']} | {r['retries']}")
+        if r["hedging"]:
+            print(f"{'':>10} hedging: {r['hedging']}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("split", help="plain-text splitter scaling")
+    p.add_argument("--engine", default="neural")
+    p.add_argument("--sizes", type=int, nargs="+", default=SPLIT_SIZES)
+    p.set_defaults(func=bench_split)
+    p = sub.add_parser("sanitize", help="SSML sanitizer throughput")
+    p.add_argument("--sizes", type=int, nargs="+", default=SANITIZE_SIZES)
+    p.set_defaults(func=bench_sanitize)
+    p = sub.add_parser("load", help="synthesize()/grid_synthesize() throughput and latency on a fake Polly")
+    p.add_argument("--targets", nargs="+", choices=("synthesize", "grid"), default=["synthesize", "grid"])
+    p.add_argument("--prompts", type=int, default=LOAD_PROMPTS, help="synthesize() calls to make")
+    p.add_argument("--threads", type=int, default=LOAD_THREADS, help="concurrent prompts / grid workers")
+    p.add_argument("--ssml-share", type=float, default=0.3, help="fraction of prompts sent as SSML")
+    p.add_argument("--voice", default=gc.BASELINE_VOICE)
+    p.add_argument("--engine", default=gc.BASELINE_ENGINE)
+    p.add_argument("--tps", type=float, default=gc.GRID_TPS, help="grid request rate limit")
+    p.add_argument("--latency-median", type=float, default=0.15, help="fake request latency, seconds")
+    p.add_argument("--latency-p99", type=float, default=0.8)
+    p.add_argument("--throttle-rate", type=float, default=0.01, help="fraction of requests throttled")
+    p.add_argument("--max-inflight", type=int, help="throttle every request beyond this many concurrent")
+    p.add_argument("--invalid-ssml-rate", type=float, default=0.01, help="fraction of SSML requests rejected")
+    p.add_argument("--hedge", action="store_true", help="synthesize() with hedged requests")
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_load)
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+In-process stand-ins for the boto3 Polly and S3 clients, so generate_copy.py can be exercised
+and benchmarked without AWS credentials, network access or cost.
+
+    import generate_copy as gc, fake_polly
+    polly = fake_polly.FakePolly(latency=fake_polly.lognormal_latency(0.15, 0.8), throttle_rate=0.02)
+    gc.set_polly_backend(polly)          # or run with POLLY_BACKEND=fake in the environment
+    gc.synthesize(gc.TEXT_INPUT, text_type="text", voice="Joanna", engine="neural", outpath="x.mp3")
+
+Audio is silent but well-formed and as long as the text would take to speak: MPEG Layer III
+frames at the requested sample rate, or 16-bit PCM. Only the methods and response fields
+generate_copy.py relies on are implemented.
+"""
+import io, itertools, math, random, re, struct, threading, time, uuid
+
+from botocore.exceptions import ClientError
+
+def _client_error(code, message, operation, status=400):
+    return ClientError({"Error": {"Code": code, "Message": message},
+                        "ResponseMetadata": {"HTTPStatusCode": status}}, operation)
+
+CHARS_PER_SECOND = 14    # speaking rate used to size the audio
+MP3_BITRATE_INDEX = 6    # 48 kbps in the MPEG-2/2.5 Layer III table
+_MP3_VERSION_BITS = {8000: (0b00, 2), 16000: (0b10, 2), 22050: (0b10, 0), 24000: (0b10, 1)}
+_ID3_TAG = b"ID3\x04\x00\x00\x00\x00\x00\x00"  # empty ID3v2.4 tag, as encoders prepend
+_TAG_RE = re.compile(r"<[^>]*>")
+
+# A small catalogue in describe_voices' shape: enough for voice selection and a grid sweep
+FAKE_VOICES = [
+    {"Id": "Joanna", "Name": "Joanna", "Gender": "Female", "LanguageCode": "en-US",
+     "SupportedEngines": ["generative", "long-form", "neural", "standard"]},
+    {"Id": "Matthew", "Name": "Matthew", "Gender": "Male", "LanguageCode": "en-US",
+     "SupportedEngines": ["generative", "neural", "standard"]},
+    {"Id": "Ruth", "Name": "Ruth", "Gender": "Female", "LanguageCode": "en-US",
+     "SupportedEngines": ["generative", "long-form", "neural"]},
+    {"Id": "Gregory", "Name": "Gregory", "Gender": "Male", "LanguageCode": "en-US",
+     "SupportedEngines": ["long-form", "neural"]},
+    {"Id": "Ivy", "Name": "Ivy", "Gender": "Female", "LanguageCode": "en-US",
+     "SupportedEngines": ["neural", "standard"]},
+    {"Id": "Joey", "Name": "Joey", "Gender": "Male", "LanguageCode": "en-US",
+     "SupportedEngines": ["neural", "standard"]},
+    {"Id": "Salli", "Name": "Salli", "Gender": "Female", "LanguageCode": "en-US",
+     "SupportedEngines": ["generative", "neural", "standard"]},
+    {"Id": "Kevin", "Name": "Kevin", "Gender": "Male", "LanguageCode": "en-US",
+     "SupportedEngines": ["neural"]},
+    {"Id": "Kajal", "Name": "Kajal", "Gender": "Female", "LanguageCode": "en-IN",
+     "SupportedEngines": ["generative", "neural"]},
+    {"Id": "Raveena", "Name": "Raveena", "Gender": "Female", "LanguageCode": "en-IN",
+     "SupportedEngines": ["standard"]},
+    {"Id": "Aditi", "Name": "Aditi", "Gender": "Female", "LanguageCode": "hi-IN",
+     "AdditionalLanguageCodes": ["en-IN"], "SupportedEngines": ["standard"]},
+]
+
+def lognormal_latency(median, p99):
+    """A sampler for request latency in seconds: log-normal with the given median and 99th percentile."""
+    mu = math.log(median)
+    sigma = max(0.0, math.log(p99 / median) / 2.326)  # z-score of the 99th percentile
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+def _mp3_frame(sample_rate):
+    version_bits, sr_idx = _MP3_VERSION_BITS.get(int(sample_rate), _MP3_VERSION_BITS[24000])
+    rate = int(sample_rate) if int(sample_rate) in _MP3_VERSION_BITS else 24000
+    # sync, version, Layer III, no CRC, 48 kbps, sample rate, no padding, mono
+    raw = (0x7FF << 21) | (version_bits << 19) | (0b01 << 17) | (1 << 16) | (MP3_BITRATE_INDEX << 12) \
+        | (sr_idx << 10) | (0b11 << 6)
+    return struct.pack(">I", raw) + bytes(576 // 8 * 48000 // rate - 4), rate
+
+def fake_audio(text, voice, output_format, sample_rate=None, text_type="text"):
+    """
+    Deterministic placeholder audio for a request, as long as `text` takes to say at
+    CHARS_PER_SECOND: silent MP3 frames behind an ID3 tag, silent 16-bit PCM, or tagged bytes
+    for other formats.
+    """
+    spoken = _TAG_RE.sub("", text) if text_type == "ssml" else text
+    seconds = max(1, len(spoken.strip())) / CHARS_PER_SECOND
+    if output_format == "mp3":
+        frame, rate = _mp3_frame(sample_rate or 24000)
+        return _ID3_TAG + frame * math.ceil(seconds * rate / 576)
+    if output_format == "pcm":
+        return bytes(int(seconds * int(sample_rate or 16000)) * 2)
+    return f"[{voice}/{output_format}] {text}\n".encode("utf-8")
+
+class FakeObjectStore:
+    """A dict-backed bucket/key store with S3's put_object/get_object call shapes."""
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, *, Bucket, Key, Body, **_):
+        with self._lock:
+            self.objects[(Bucket, Key)] = bytes(Body)
+        return {}
+
+    def get_object(self, *, Bucket, Key, **_):
+        with self._lock:
+            body = self.objects.get((Bucket, Key))
+        if body is None:
+            raise _client_error("NoSuchKey", f"The specified key does not exist: {Key}", "GetObject", 404)
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+class _VoicePaginator:
+    def __init__(self, voices):
+        self.voices = voices
+
+    def paginate(self, *, Engine=None, LanguageCode=None, **_):
+        yield {"Voices": [v for v in self.voices
+                          if (Engine is None or Engine in v["SupportedEngines"])
+                          and (LanguageCode is None or v["LanguageCode"] == LanguageCode)]}
+
+class FakePolly:
+    """
+    Polly with synthesize_speech, describe_voices and the asynchronous task API.
+
+    synthesize_speech sleeps for a latency drawn from `latency` (seconds, or a callable taking a
+    random.Random), then fails with ThrottlingException at `throttle_rate` (and always while more
+    than `max_inflight` calls are running), with ServiceFailureException at `failure_rate`, and
+    with InvalidSsmlException for SSML at `invalid_ssml_rate` or whenever it contains one of
+    `reject_tags`. Voice/engine pairs missing from `voices` fail with ValidationException.
+
+    A task is "scheduled", then "inProgress", and "completed" once `task_seconds` have passed,
+    at which point its audio is written to `store` under OutputS3KeyPrefix + TaskId.
+    """
+    def __init__(self, store=None, *, task_seconds=0.5, region="us-east-1", voices=FAKE_VOICES, latency=0.0,
+                 throttle_rate=0.0, max_inflight=None, failure_rate=0.0, invalid_ssml_rate=0.0,
+                 reject_tags=(), seed=None):
+        self.store = store if store is not None else FakeObjectStore()
+        self.task_seconds = task_seconds
+        self.region = region
+        self.voices = list(voices)
+        self._engines = {v["Id"]: set(v["SupportedEngines"]) for v in self.voices}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.max_inflight = max_inflight
+        self.failure_rate = failure_rate
+        self.invalid_ssml_rate = invalid_ssml_rate
+        self.reject_tags = tuple(reject_tags)
+        self.rng = random.Random(seed)
+        self.tasks = {}
+        self.calls = itertools.count()
+        self.counts = {"served": 0, "throttled": 0, "failed": 0, "invalid_ssml": 0}
+        self.latencies = []  # seconds slept per synthesize_speech call
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            delay = self.latency(self.rng) if callable(self.latency) else float(self.latency)
+            return delay, self.rng.random(), self.rng.random(), self.rng.random()
+
+    def _fail(self, kind, error):
+        with self._lock:
+            self.counts[kind] += 1
+        raise error
+
+    def describe_voices(self, **kwargs):
+        next(self.calls)
+        return next(_VoicePaginator(self.voices).paginate(**kwargs))
+
+    def get_paginator(self, operation):
+        if operation != "describe_voices":
+            raise NotImplementedError(operation)
+        return _VoicePaginator(self.voices)
+
+    def synthesize_speech(self, *, Text, VoiceId, OutputFormat, TextType="text", Engine="standard",
+                          SampleRate=None, **kwargs):
+        next(self.calls)
+        delay, throttle_roll, failure_roll, ssml_roll = self._draw()
+        with self._lock:
+            self.inflight += 1
+            crowded = self.max_inflight is not None and self.inflight > self.max_inflight
+        try:
+            time.sleep(delay)
+            with self._lock:
+                self.latencies.append(delay)
+            if crowded or throttle_roll < self.throttle_rate:
+                self._fail("throttled", _client_error("ThrottlingException", "Rate exceeded", "SynthesizeSpeech"))
+            if failure_roll < self.failure_rate:
+                self._fail("failed", _client_error("ServiceFailureException", "Internal service failure",
+                                                   "SynthesizeSpeech", 500))
+            if Engine not in self._engines.get(VoiceId, ()):
+                raise _client_error("ValidationException", f"Voice {VoiceId} does not support the {Engine} engine",
+                                    "SynthesizeSpeech")
+            if TextType == "ssml" and (ssml_roll < self.invalid_ssml_rate
+                                       or any(f"<{tag}" in Text for tag in self.reject_tags)):
+                self._fail("invalid_ssml", _client_error("InvalidSsmlException", "Unsupported SSML for this voice",
+                                                         "SynthesizeSpeech"))
+            audio = fake_audio(Text, VoiceId, OutputFormat, SampleRate, TextType)
+            with self._lock:
+                self.counts["served"] += 1
+        finally:
+            with self._lock:
+                self.inflight -= 1
+        content_type = {"mp3": "audio/mpeg", "ogg_vorbis": "audio/ogg", "pcm": "audio/pcm"}.get(OutputFormat)
+        return {"AudioStream": io.BytesIO(audio), "ContentType": content_type,
+                "RequestCharacters": len(_TAG_RE.sub("", Text) if TextType == "ssml" else Text)}
+
+    def start_speech_synthesis_task(self, *, Text, VoiceId, OutputFormat, OutputS3BucketName,
+                                    OutputS3KeyPrefix="", TextType="text", Engine="standard", SampleRate=None,
+                                    **kwargs):
+        next(self.calls)
+        task_id = str(uuid.uuid4())
+        key = f"{OutputS3KeyPrefix}{task_id}.{'ogg' if OutputFormat == 'ogg_vorbis' else OutputFormat}"
+        task = {
+            "TaskId": task_id, "TaskStatus": "scheduled", "Engine": Engine, "VoiceId": VoiceId,
+            "OutputFormat": OutputFormat, "TextType": TextType, "RequestCharacters": len(Text),
+            "OutputUri": f"https://s3.{self.region}.amazonaws.com/{OutputS3BucketName}/{key}",
+        }
+        if SampleRate is not None:
+            task["SampleRate"] = SampleRate
+        with self._lock:
+            self.tasks[task_id] = {"task": task, "text": Text, "bucket": OutputS3BucketName, "key": key,
+                                   "started": time.monotonic()}
+        return {"SynthesisTask": dict(task)}
+
+    def get_speech_synthesis_task(self, *, TaskId):
+        next(self.calls)
+        with self._lock:
+            entry = self.tasks.get(TaskId)
+            if entry is None:
+                raise _client_error("SynthesisTaskNotFoundException", f"Task {TaskId} not found",
+                                    "GetSpeechSynthesisTask")
+            task = entry["task"]
+            elapsed = time.monotonic() - entry["started"]
+            if task["TaskStatus"] != "completed":
+                if elapsed >= self.task_seconds:
+                    self.store.put_object(Bucket=entry["bucket"], Key=entry["key"],
+                                          Body=fake_audio(entry["text"], task["VoiceId"], task["OutputFormat"],
+                                                          task.get("SampleRate"), task["TextType"]))
+                    task["TaskStatus"] = "completed"
+                elif elapsed >= self.task_seconds / 3:
+                    task["TaskStatus"] = "inProgress"
+            return {"SynthesisTask": dict(task)}
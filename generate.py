@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 # pip install boto3
-import os, re
+import os, re, json, shutil, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
 # ================== CONFIG (edit these) ==================
@@ -15,6 +18,11 @@ BASELINE_VOICE   = "Danielle"       # fallback if discovery fails
 OUTPUT_FORMAT    = "mp3"            # "mp3" | "ogg_vorbis" | "pcm"
 SAMPLE_RATE      = "24000"
 OUTPUT_BASE_DIR  = "out_vm"         # base folder for all recordings
+SEGMENT_CONCURRENCY = 4             # parallel synthesize_speech calls per script (1 = sequential)
+POLLY_MAX_POOL     = 32             # keep-alive HTTP connections in the shared Polly client's pool
+VOICE_CACHE_PATH   = os.path.join(OUTPUT_BASE_DIR, "voices.json")  # on-disk describe_voices catalogue
+VOICE_CACHE_TTL    = 24 * 3600      # seconds before the voice catalogue is fetched again
+STREAM_CHUNK_SIZE  = 64 * 1024      # bytes copied per read from each AudioStream
 
 # Long-form limits (conservative default)
 GEN_LIMIT    = 1500
@@ -60,28 +68,57 @@ def _assert_aws_creds():
             "and export AWS_PROFILE and AWS_SDK_LOAD_CONFIG before running this script."
         )
 
+_POLLY_CLIENT = None
+_POLLY_CLIENT_LOCK = threading.Lock()
+
 def polly_client():
-    return boto3.client("polly", region_name=POLLY_REGION)
+    """
+    Return the process-wide Polly client, building it on first use.
+    botocore clients are thread-safe, so every worker reuses its warm keep-alive connections
+    instead of paying for credential resolution, endpoint loading and a cold TLS handshake.
+    """
+    global _POLLY_CLIENT
+    if _POLLY_CLIENT is None:
+        with _POLLY_CLIENT_LOCK:
+            if _POLLY_CLIENT is None:
+                cfg = Config(max_pool_connections=POLLY_MAX_POOL, tcp_keepalive=True)
+                _POLLY_CLIENT = boto3.client("polly", region_name=POLLY_REGION, config=cfg)
+    return _POLLY_CLIENT
 
 def ensure_dirs(*paths):
     for p in paths:
         os.makedirs(p, exist_ok=True)
 
+_SSML_MARKUP_RE = re.compile(r"(<!--.*?-->|<[^<>]*>)", re.DOTALL)
+_SSML_TAG_RE = re.compile(r"<\s*(/?)\s*([\w:.-]+)(.*?)(/?)\s*>$", re.DOTALL)
+_BREAK_MS_RE = re.compile(r'\btime\s*=\s*"(\d+)ms"')
+_MINIMAL_TAGS = frozenset(("p", "s", "break"))  # <speak> is re-added around the result
+
+def _minimal_markup(tok):
+    """What one comment or tag becomes in sanitize_ssml_minimal() ("" removes it)."""
+    if tok.startswith("<!--"):
+        return ""
+    tm = _SSML_TAG_RE.match(tok)
+    if not tm:
+        return tok
+    _, name, attrs, self_closing = tm.groups()
+    name = name.lower()
+    if name not in _MINIMAL_TAGS:
+        return ""
+    if name == "break" and self_closing:
+        bm = _BREAK_MS_RE.search(attrs)
+        if bm:
+            return f'<break time="{max(100, min(int(bm.group(1)), 400))}ms"/>'
+    return tok
+
 def sanitize_ssml_minimal(ssml_text: str) -> str:
-    # Keep only speak/p/s/break and clamp breaks
-    t = ssml_text
-    t = re.sub(r"<!--.*?-->", "", t, flags=re.DOTALL)
-    t = re.sub(r"<(?!/?(speak|p|s|break)\b)[^>]+>", "", t, flags=re.IGNORECASE)
-    def _normalize_break(m):
-        try:
-            ms = max(100, min(int(m.group(1)), 400))
-        except Exception:
-            ms = 200
-        return f'<break time="{ms}ms"/>'
-    t = re.sub(r'<break[^>]*time="(\d+)ms"[^>]*/>', _normalize_break, t)
-    inner = re.sub(r"^\s*<\s*speak\s*>", "", t.strip(), flags=re.IGNORECASE)
-    inner = re.sub(r"<\s*/\s*speak\s*>\s*$", "", inner, flags=re.IGNORECASE)
-    return f"<speak>{inner}</speak>"
+    # Keep only speak/p/s/break and clamp breaks, in one pass: the document is tokenized once and
+    # each distinct tag is rewritten once, then mapped back in
+    parts = _SSML_MARKUP_RE.split(ssml_text.strip())
+    markup = parts[1::2]
+    rewrite = {tok: _minimal_markup(tok) for tok in set(markup)}
+    parts[1::2] = map(rewrite.__getitem__, markup)
+    return f"<speak>{''.join(parts)}</speak>"
 
 def strip_all_tags(ssml_text: str) -> str:
     # Convert SSML to plain text for engines that reject SSML entirely
@@ -145,7 +182,104 @@ def split_plain_text(text: str, engine: str):
     if buf: parts.append(buf)
     return parts
 
-def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE):
+def _copy_stream(stream, dst, chunk_size=STREAM_CHUNK_SIZE):
+    """Copy a file-like AudioStream into dst in fixed-size chunks; returns the byte count."""
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return total
+        dst.write(chunk)
+        total += len(chunk)
+
+_UMASK = os.umask(0o022)  # read once at import; os.umask() can only be queried by setting it
+os.umask(_UMASK)
+
+@contextmanager
+def atomic_output(outpath):
+    """
+    Yield a temp file next to outpath and rename it into place only when the block succeeds,
+    so a crash or Ctrl-C never leaves a half-written file at the final path.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(outpath)}.", suffix=".part",
+                               dir=os.path.dirname(outpath) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the mode of the file being replaced, else what open() would give
+        try:
+            mode = os.stat(outpath).st_mode & 0o777
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, outpath)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def _synthesize_segment(pc, seg, idx, *, text_type, voice, engine, output_format, sample_rate):
+    """
+    Synthesize one segment and return its audio as a spooled temp file positioned at 0.
+    A generative SSML rejection falls back to plain text for this segment only.
+    """
+    try:
+        resp = pc.synthesize_speech(
+            Text=seg,
+            TextType=text_type,
+            VoiceId=voice,
+            Engine=engine,
+            OutputFormat=output_format,
+            SampleRate=sample_rate
+        )
+    except (BotoCoreError, ClientError) as e:
+        msg = str(e)
+        # If generative rejects SSML entirely, try stripping to text while keeping generative
+        if text_type == "ssml" and engine == "generative":
+            try:
+                stripped = strip_all_tags(seg)
+                resp = pc.synthesize_speech(
+                    Text=stripped, TextType="text", VoiceId=voice, Engine="generative",
+                    OutputFormat=output_format, SampleRate=sample_rate
+                )
+            except (BotoCoreError, ClientError):
+                raise RuntimeError(f"Generative engine rejected SSML and text fallback for {voice} seg#{idx}: {e}")
+        else:
+            raise RuntimeError(f"synthesize_speech failed for {voice} ({engine}) seg#{idx}: {e}")
+
+    stream = resp.get("AudioStream")
+    if not stream:
+        raise RuntimeError("No AudioStream in response.")
+    # Spool to an anonymous temp file so memory stays flat however long the segment is
+    part = tempfile.TemporaryFile()
+    _copy_stream(stream, part)
+    part.seek(0)
+    return part
+
+def _map_segments(fn, segments, concurrency):
+    """
+    Run fn(idx, seg) over segments with at most `concurrency` calls in flight.
+    Results come back in segment order; the first failure cancels segments not yet started.
+    """
+    items = list(enumerate(segments, 1))
+    workers = max(1, min(concurrency or 1, len(items)))
+    if workers == 1:
+        return [fn(idx, seg) for idx, seg in items]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(fn, idx, seg) for idx, seg in items]
+        try:
+            return [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+
+def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE,
+               concurrency=SEGMENT_CONCURRENCY):
     pc = polly_client()
 
     # Prepare segments
@@ -155,51 +289,86 @@ def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_
     else:
         segments = split_plain_text(text, engine)
 
-    audio_bytes = b""
-    for idx, seg in enumerate(segments, 1):
-        try:
-            resp = pc.synthesize_speech(
-                Text=seg,
-                TextType=text_type,
-                VoiceId=voice,
-                Engine=engine,
-                OutputFormat=output_format,
-                SampleRate=sample_rate
-            )
-        except (BotoCoreError, ClientError) as e:
-            msg = str(e)
-            # If generative rejects SSML entirely, try stripping to text while keeping generative
-            if text_type == "ssml" and engine == "generative":
-                try:
-                    stripped = strip_all_tags(seg)
-                    resp = pc.synthesize_speech(
-                        Text=stripped, TextType="text", VoiceId=voice, Engine="generative",
-                        OutputFormat=output_format, SampleRate=sample_rate
-                    )
-                except (BotoCoreError, ClientError):
-                    raise RuntimeError(f"Generative engine rejected SSML and text fallback for {voice} seg#{idx}: {e}")
-            else:
-                raise RuntimeError(f"synthesize_speech failed for {voice} ({engine}) seg#{idx}: {e}")
-
-        stream = resp.get("AudioStream")
-        if not stream:
-            raise RuntimeError("No AudioStream in response.")
-        audio_bytes += stream.read()
+    def _one(idx, seg):
+        return _synthesize_segment(pc, seg, idx, text_type=text_type, voice=voice, engine=engine,
+                                   output_format=output_format, sample_rate=sample_rate)
 
-    with open(outpath, "wb") as f:
-        f.write(audio_bytes)
+    # Segments are sent concurrently (bounded by `concurrency`) and joined back in original order
+    parts = _map_segments(_one, segments, concurrency)
+    try:
+        with atomic_output(outpath) as out:
+            for part in parts:
+                shutil.copyfileobj(part, out, STREAM_CHUNK_SIZE)
+    finally:
+        for part in parts:
+            part.close()
     print(f"Saved: {outpath}")
 
+class VoiceCatalogue:
+    """
+    Every Polly voice in POLLY_REGION, indexed by voice Id, primary language code and supported engine.
+    """
+    def __init__(self, voices):
+        self.voices = voices
+        self.by_id = {v["Id"]: v for v in voices}
+        self.by_language = {}
+        self.by_engine = {}
+        for v in voices:
+            self.by_language.setdefault(v.get("LanguageCode"), []).append(v)
+            for eng in v.get("SupportedEngines") or []:
+                self.by_engine.setdefault(eng, []).append(v)
+
+    def engines(self, voice_id):
+        return (self.by_id.get(voice_id) or {}).get("SupportedEngines") or []
+
+    def supports(self, voice_id, engine):
+        return engine in self.engines(voice_id)
+
+_VOICE_CATALOGUE = None
+_VOICE_CATALOGUE_LOCK = threading.Lock()
+
+def _load_cached_voices():
+    try:
+        with open(VOICE_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("region") != POLLY_REGION or time.time() - cached.get("fetched_at", 0) > VOICE_CACHE_TTL:
+        return None
+    return cached.get("voices")
+
+def _save_cached_voices(voices):
+    try:
+        ensure_dirs(os.path.dirname(VOICE_CACHE_PATH) or ".")
+        tmp = f"{VOICE_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"region": POLLY_REGION, "fetched_at": time.time(), "voices": voices}, f)
+        os.replace(tmp, VOICE_CACHE_PATH)
+    except OSError as e:
+        print(f"[WARN] Could not cache voice catalogue at {VOICE_CACHE_PATH}: {e}")
+
+def voice_catalogue(refresh=False):
+    """
+    Fetch describe_voices once per process (and once per VOICE_CACHE_TTL on disk).
+    All voice selection and grid planning is answered from this in-memory index.
+    """
+    global _VOICE_CATALOGUE
+    with _VOICE_CATALOGUE_LOCK:
+        if _VOICE_CATALOGUE is None or refresh:
+            voices = None if refresh else _load_cached_voices()
+            if voices is None:
+                voices = []
+                for page in polly_client().get_paginator("describe_voices").paginate():
+                    voices.extend(page.get("Voices", []))
+                _save_cached_voices(voices)
+            _VOICE_CATALOGUE = VoiceCatalogue(voices)
+        return _VOICE_CATALOGUE
+
 def list_voices(language_code=None):
-    pc = polly_client()
-    voices = []
-    paginator = pc.get_paginator("describe_voices")
-    kwargs = {}
+    cat = voice_catalogue()
     if language_code:
-        kwargs["LanguageCode"] = language_code
-    for page in paginator.paginate(**kwargs):
-        voices.extend(page.get("Voices", []))
-    return voices
+        return list(cat.by_language.get(language_code, []))
+    return list(cat.voices)
 
 def select_generative_voice():
     """
@@ -207,22 +376,20 @@ def select_generative_voice():
     Prefer Indian voices if available (Kajal, Raveena, Aditi), otherwise pick common generative voices (Danielle, Matthew, Ruth).
     """
     try:
-        all_voices = list_voices()
-        gen_voices = [v for v in all_voices if "generative" in (v.get("SupportedEngines") or [])]
+        cat = voice_catalogue()
+        gen_voices = cat.by_engine.get("generative", [])
         if not gen_voices:
             return BASELINE_VOICE, BASELINE_ENGINE
 
         preferred_indian = ["Kajal", "Raveena", "Aditi"]
         for vid in preferred_indian:
-            for v in gen_voices:
-                if v.get("Id") == vid:
-                    return vid, "generative"
+            if cat.supports(vid, "generative"):
+                return vid, "generative"
 
         preferred_common = ["Danielle", "Matthew", "Ruth", "Amy", "Gregory"]
         for vid in preferred_common:
-            for v in gen_voices:
-                if v.get("Id") == vid:
-                    return vid, "generative"
+            if cat.supports(vid, "generative"):
+                return vid, "generative"
 
         # Fallback to the first available generative voice
         return gen_voices[0].get("Id"), "generative"
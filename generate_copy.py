@@ -1,8 +1,18 @@
 #!/usr/bin/env python3
 # pip install boto3
-import os, re
+import os, re, json, asyncio, hashlib, random, shutil, tempfile, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from xml.sax.saxutils import unescape as xml_unescape
+import xml.etree.ElementTree as ET
 import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+
+import mp3_frames
 
 # ================== CONFIG (edit these) ==================
 os.environ.setdefault("AWS_PROFILE", "Power-root")
@@ -10,19 +20,57 @@ os.environ.setdefault("AWS_SDK_LOAD_CONFIG", "1")
 os.environ.setdefault("AWS_DEFAULT_REGION", "ap-south-1")
 
 POLLY_REGION     = "us-east-1"      # voices/engines vary by region
+POLLY_BACKEND    = os.environ.get("POLLY_BACKEND", "aws")  # "aws", or "fake" for fake_polly.FakePolly (no credentials)
 BASELINE_ENGINE  = "neural"         # "neural" or "standard"
 BASELINE_VOICE   = "Joanna"         # e.g., "Matthew", "Amy", "Aria" (region-dependent)
 OUTPUT_FORMAT    = "mp3"            # "mp3" | "ogg_vorbis" | "pcm"
 SAMPLE_RATE      = "24000"
 GRID_LANGUAGE_CODE = "en-US"        # None for all languages
 DO_GRID            = False          # try all voice/engine combos
-OUTPUT_BASE_DIR    = "out_ang"      # base folder for all recordings
+OUTPUT_BASE_DIR    = "out_ang" if POLLY_BACKEND == "aws" else f"out_{POLLY_BACKEND}"  # base folder for all recordings (and caches)
 PRESERVE_RICH_SSML = True           # if True, use Standard engine for SSML to keep amazon:* and pitch/volume effects
+SEGMENT_CONCURRENCY = 4             # parallel synthesize_speech calls per script (1 = sequential)
+POLLY_MAX_POOL     = 32             # keep-alive HTTP connections in the shared Polly client's pool
+VOICE_CACHE_PATH   = os.path.join(OUTPUT_BASE_DIR, "voices.json")  # on-disk describe_voices catalogue
+VOICE_CACHE_TTL    = 24 * 3600      # seconds before the voice catalogue is fetched again
+STREAM_CHUNK_SIZE  = 64 * 1024      # bytes copied per read from each AudioStream
+SEGMENT_CACHE_DIR  = os.path.join(OUTPUT_BASE_DIR, "segment_cache")  # content-addressed segment audio
+SEGMENT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # LRU-evict cached segments beyond this size (0 disables)
+POLLY_TPS          = 80.0           # account-wide synthesize_speech quota, shared by every caller in this process
+PRIORITY_WEIGHTS   = {"interactive": 8, "bulk": 1}  # share of POLLY_TPS each class gets while both are queued
+GRID_WORKERS       = 4              # (voice, engine, variant) jobs synthesized in parallel by the grid
+GRID_TPS           = 8.0            # synthesize_speech transactions/second shared by all grid workers
+POLLY_MAX_INFLIGHT = 16             # ceiling for the adaptive limit on concurrent synthesize_speech calls
+RETRY_MAX_ATTEMPTS = 6              # tries per synthesize_speech call for throttling and transient errors
+RETRY_BASE_DELAY   = 0.2            # seconds; decorrelated-jitter backoff starts here...
+RETRY_MAX_DELAY    = 20.0           # ...and never sleeps longer than this
+HEDGE_REQUESTS     = False          # synthesize(): send a duplicate request when one is slower than usual
+HEDGE_PERCENTILE   = 95             # ...slower than this percentile of recent latencies for the engine
+HEDGE_DEFAULT_DELAY = 1.0           # seconds before hedging until HEDGE_MIN_SAMPLES latencies are known
+HEDGE_MIN_SAMPLES  = 20
+HEDGE_MIN_DELAY    = 0.05           # never hedge sooner than this
+HEDGE_BUDGET       = 0.05           # extra requests allowed, as a fraction of hedgeable requests
+GRID_LEDGER_PATH   = os.path.join(OUTPUT_BASE_DIR, "grid_ledger.jsonl")  # finished grid jobs, for resuming
+CAPABILITY_STORE_PATH = os.path.join(OUTPUT_BASE_DIR, "ssml_capabilities.json")  # SSML Polly rejected per voice (None disables)
+CAPABILITY_TTL     = 7 * 24 * 3600  # seconds a learned rejection is trusted before the feature is tried again
+LONGFORM_MODE      = False          # send the SSML baseline as one StartSpeechSynthesisTask instead of split requests
+LONGFORM_BUCKET    = os.environ.get("POLLY_LONGFORM_BUCKET")  # S3 bucket Polly writes task output to
+LONGFORM_PREFIX    = "polly-longform/"  # key prefix for task output in LONGFORM_BUCKET
+LONGFORM_POLL_INITIAL = 2.0         # seconds before a task is first polled; doubles per poll...
+LONGFORM_POLL_MAX  = 30.0           # ...up to this interval
+LONGFORM_DOWNLOAD_WORKERS = 4       # finished task outputs streamed down in parallel
+PCM_FIRST          = False          # request PCM once and derive WAVs at PCM_DERIVED_RATES locally (needs numpy)
+PCM_SOURCE_RATE    = "16000"        # Polly PCM is only offered at 8000 or 16000 Hz
+PCM_DERIVED_RATES  = (8000, 16000, 22050)  # WAVs written per PCM-first synthesis
+PCM_SMOOTH_SEAMS   = True           # trim silence to a fixed gap and crossfade PCM segment joins (needs numpy)
 
-# Long-form limits (room for safety)
-NEURAL_LIMIT  = 1500
+# Per-request budgets in billed characters (Polly does not bill SSML tags)
+NEURAL_LIMIT  = 3000     # SynthesizeSpeech's billed-character cap, the same for every engine
 STANDARD_LIMIT= 3000
-SSML_HEADROOM = 0.85  # tags add chars; use less than hard limit
+MAX_REQUEST_CHARS = 6000  # Polly's cap on total characters per request, tags included
+PACK_MIN_FILL = 0.5       # prefer the strongest break that still fills a chunk to this fraction
+LONGFORM_MAX_CHARS = 100_000          # StartSpeechSynthesisTask billed-character cap per task
+LONGFORM_MAX_REQUEST_CHARS = 200_000  # ...and its cap on total characters, tags included
 
 TEXT_INPUT = (
     """
@@ -45,6 +93,8 @@ SSML_INPUT = """<speak>
 
 # ================== RUNTIME ==================
 def _assert_aws_creds():
+    if POLLY_BACKEND != "aws":
+        return
     s = boto3.Session()
     if s.get_credentials() is None:
         raise RuntimeError(
@@ -53,208 +103,1577 @@ def _assert_aws_creds():
             "and export AWS_PROFILE and AWS_SDK_LOAD_CONFIG before running this script."
         )
 
+_POLLY_CLIENT = None
+_SYNTHESIS_CLIENT = None
+_POLLY_CLIENT_LOCK = threading.Lock()
+
 def polly_client():
-    return boto3.client("polly", region_name=POLLY_REGION)
+    """
+    Return the process-wide Polly client, building it on first use.
+    botocore clients are thread-safe, so every worker reuses its warm keep-alive connections
+    instead of paying for credential resolution, endpoint loading and a cold TLS handshake.
+    botocore's own retries stay on here, for describe_voices and the task API.
+    """
+    global _POLLY_CLIENT
+    if _POLLY_CLIENT is None:
+        with _POLLY_CLIENT_LOCK:
+            if _POLLY_CLIENT is None and POLLY_BACKEND == "fake":
+                import fake_polly
+                _POLLY_CLIENT = fake_polly.FakePolly(region=POLLY_REGION)
+            elif _POLLY_CLIENT is None:
+                cfg = Config(max_pool_connections=POLLY_MAX_POOL, tcp_keepalive=True)
+                _POLLY_CLIENT = boto3.client("polly", region_name=POLLY_REGION, config=cfg)
+    return _POLLY_CLIENT
+
+def synthesis_client():
+    """
+    The process-wide Polly client for synthesize_speech, with botocore's own retries off:
+    _call_polly() retries with backoff and concurrency control, and the two must not stack.
+    """
+    global _SYNTHESIS_CLIENT
+    if POLLY_BACKEND != "aws":
+        return polly_client()
+    if _SYNTHESIS_CLIENT is None:
+        with _POLLY_CLIENT_LOCK:
+            if _SYNTHESIS_CLIENT is None:
+                cfg = Config(max_pool_connections=POLLY_MAX_POOL, tcp_keepalive=True,
+                             retries={"total_max_attempts": 1})
+                _SYNTHESIS_CLIENT = boto3.client("polly", region_name=POLLY_REGION, config=cfg)
+    return _SYNTHESIS_CLIENT
+
+_S3_CLIENT = None
+
+def s3_client():
+    """Process-wide S3 client for StartSpeechSynthesisTask output, pooled like polly_client()."""
+    global _S3_CLIENT
+    if _S3_CLIENT is None and POLLY_BACKEND == "fake":
+        return polly_client().store
+    if _S3_CLIENT is None:
+        with _POLLY_CLIENT_LOCK:
+            if _S3_CLIENT is None:
+                cfg = Config(max_pool_connections=POLLY_MAX_POOL, tcp_keepalive=True)
+                _S3_CLIENT = boto3.client("s3", region_name=POLLY_REGION, config=cfg)
+    return _S3_CLIENT
+
+def set_polly_backend(polly, store=None):
+    """
+    Send every Polly call in this process to `polly` (anything with the boto3 Polly client's
+    call shapes, such as fake_polly.FakePolly) and task output to `store` (default: polly.store).
+    The voice catalogue is re-read from the new backend and not written to VOICE_CACHE_PATH.
+    """
+    global _POLLY_CLIENT, _SYNTHESIS_CLIENT, _S3_CLIENT, _VOICE_CATALOGUE
+    with _POLLY_CLIENT_LOCK:
+        _POLLY_CLIENT = _SYNTHESIS_CLIENT = polly
+        _S3_CLIENT = store if store is not None else getattr(polly, "store", None)
+    voices = []
+    for page in polly.get_paginator("describe_voices").paginate():
+        voices.extend(page.get("Voices", []))
+    with _VOICE_CATALOGUE_LOCK:
+        _VOICE_CATALOGUE = VoiceCatalogue(voices)
 
 def ensure_dirs(*paths):
     for p in paths:
         os.makedirs(p, exist_ok=True)
 
-def sanitize_ssml_for_neural(ssml_text: str) -> str:
-    t = ssml_text
-    # Remove comments
-    t = re.sub(r"<!--.*?-->", "", t, flags=re.DOTALL)
-    # Strip all amazon:* tags but keep inner contents
-    t = re.sub(r"</?amazon:[^>]+>", "", t)
-    # Remove <mark .../>
-    t = re.sub(r"<mark[^>]*/>", "", t)
-    # Replace <phoneme ...>inner</phoneme> with inner
-    t = re.sub(r"<phoneme[^>]*>(.*?)</phoneme>", r"\1", t, flags=re.DOTALL)
-    # Drop pitch/volume in prosody; keep rate
-    def _strip_prosody_attrs(m):
-        attrs = m.group(1)
-        attrs = re.sub(r'\s+pitch="[^"]*"', "", attrs)
-        attrs = re.sub(r'\s+volume="[^"]*"', "", attrs)
-        return f"<prosody{attrs}>"
-    t = re.sub(r"<prosody([^>]*)>", _strip_prosody_attrs, t)
-    # Clamp breaks (100–400ms)
-    def _clamp_break(m):
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting synthesize_speech calls to `rate` per second.
+    Throttling halves the refill rate; each success creeps it back towards the configured ceiling.
+    """
+    def __init__(self, rate, burst=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.acquired = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available and return 0.0, else return the seconds until one will be."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                self.acquired += 1
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = 0.0
+
+class PriorityScheduler:
+    """
+    One TokenBucket of `rate` requests/second shared by priority classes with weighted fair
+    queueing: while several classes are waiting, each gets tokens in proportion to its weight
+    (a class that was idle does not bank credit), and a class alone gets the whole rate.
+    Waiters within a class are served first come, first served.
+    """
+    def __init__(self, rate, weights):
+        self.bucket = TokenBucket(rate)
+        self.weights = dict(weights)
+        self._queues = {name: deque() for name in self.weights}
+        self._vtime = dict.fromkeys(self.weights, 0.0)
+        self._clock = 0.0
+        self._lanes = {}
+        self.granted = dict.fromkeys(self.weights, 0)
+        self.peak_depth = dict.fromkeys(self.weights, 0)
+        self._waits = {name: deque(maxlen=1000) for name in self.weights}
+        self._wait_total = dict.fromkeys(self.weights, 0.0)
+        self._cond = threading.Condition()
+
+    def _next_class(self):
+        waiting = [name for name, q in self._queues.items() if q]
+        return min(waiting, key=lambda name: (self._vtime[name], -self.weights[name])) if waiting else None
+
+    def acquire(self, name):
+        ticket, queued = object(), time.monotonic()
+        with self._cond:
+            q = self._queues[name]
+            if not q:
+                self._vtime[name] = max(self._vtime[name], self._clock)
+            q.append(ticket)
+            self.peak_depth[name] = max(self.peak_depth[name], len(q))
+            while True:
+                wait = None
+                if self._next_class() == name and q[0] is ticket:
+                    wait = self.bucket.try_acquire()
+                    if not wait:
+                        break
+                self._cond.wait(wait)
+            q.popleft()
+            self._clock = self._vtime[name]
+            self._vtime[name] += 1.0 / self.weights[name]
+            waited = time.monotonic() - queued
+            self.granted[name] += 1
+            self._waits[name].append(waited)
+            self._wait_total[name] += waited
+            self._cond.notify_all()
+
+    def on_success(self):
+        self.bucket.on_success()
+
+    def on_throttle(self):
+        self.bucket.on_throttle()
+        with self._cond:
+            self._cond.notify_all()
+
+    def lane(self, name, max_rate=None):
+        """A TokenBucket-shaped limiter for class `name`; `max_rate` also caps that caller on its own."""
+        if name not in self.weights:
+            raise ValueError(f"unknown priority class {name!r} (expected one of {', '.join(self.weights)})")
+        if max_rate is not None:
+            return _SchedulerLane(self, name, max_rate)
+        with self._cond:
+            return self._lanes.setdefault(name, _SchedulerLane(self, name))
+
+    def metrics(self):
+        """{class: {"queued", "peak_queued", "granted", "wait_mean", "wait_p99"}} (waits in seconds)."""
+        with self._cond:
+            out = {}
+            for name in self.weights:
+                waits = sorted(self._waits[name])
+                out[name] = {
+                    "queued": len(self._queues[name]), "peak_queued": self.peak_depth[name],
+                    "granted": self.granted[name],
+                    "wait_mean": self._wait_total[name] / self.granted[name] if self.granted[name] else 0.0,
+                    "wait_p99": waits[min(len(waits) - 1, int(0.99 * len(waits)))] if waits else 0.0,
+                }
+            return out
+
+    def stats(self):
+        parts = [f"{name} {m['granted']} granted, {m['queued']} queued (peak {m['peak_queued']}), "
+                 f"wait mean {m['wait_mean'] * 1000:.0f} ms / p99 {m['wait_p99'] * 1000:.0f} ms"
+                 for name, m in self.metrics().items()]
+        return " | ".join(parts) + f" | rate {self.bucket.rate:.1f}/{self.bucket.max_rate:.1f} TPS"
+
+class _SchedulerLane:
+    """What _call_polly() sees as `limiter`: one priority class of a PriorityScheduler."""
+    def __init__(self, scheduler, name, max_rate=None):
+        self.scheduler = scheduler
+        self.name = name
+        self.cap = TokenBucket(max_rate) if max_rate is not None else None
+        self.acquired = 0
+        self.throttled = 0
+
+    @property
+    def rate(self):
+        rate = self.scheduler.bucket.rate
+        return rate if self.cap is None else min(rate, self.cap.rate)
+
+    def acquire(self):
+        if self.cap is not None:
+            self.cap.acquire()
+        self.scheduler.acquire(self.name)
+        self.acquired += 1
+
+    def on_success(self):
+        if self.cap is not None:
+            self.cap.on_success()
+        self.scheduler.on_success()
+
+    def on_throttle(self):
+        self.throttled += 1
+        if self.cap is not None:
+            self.cap.on_throttle()
+        self.scheduler.on_throttle()
+
+POLLY_SCHEDULER = PriorityScheduler(POLLY_TPS, PRIORITY_WEIGHTS)
+
+def _is_throttle(e) -> bool:
+    return "ThrottlingException" in str(e) or "Rate exceeded" in str(e)
+
+_THROTTLE_CODES = {"ThrottlingException", "Throttling", "TooManyRequestsException", "RequestLimitExceeded"}
+_TRANSIENT_CODES = {"ServiceFailureException", "ServiceUnavailableException", "ServiceUnavailable",
+                    "InternalFailure", "InternalServerError", "RequestTimeout", "RequestTimeoutException"}
+
+def classify_error(e) -> str:
+    """
+    "throttle" (retry, and back off the request rate), "transient" (retry: 5xx, connection
+    resets, timeouts) or "fatal" (InvalidSsml, bad voice/engine, auth, anything unrecognised).
+    """
+    if isinstance(e, ClientError):
+        err = e.response.get("Error", {})
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        code = err.get("Code", "")
+        if code in _THROTTLE_CODES or status == 429 or _is_throttle(e):
+            return "throttle"
+        if code in _TRANSIENT_CODES or status >= 500:
+            return "transient"
+        return "fatal"
+    if isinstance(e, (BotoConnectionError, HTTPClientError, ConnectionError, TimeoutError)):
+        return "transient"
+    return "fatal"
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on synthesize_speech calls in flight across every thread: the limit grows by one
+    per `limit` successes and halves on throttling (at most once per `cooldown` seconds, so a
+    burst of throttles from one overload cuts it only once).
+    """
+    def __init__(self, maximum, minimum=1, cooldown=1.0):
+        self.maximum = max(1, int(maximum))
+        self.minimum = max(1, min(int(minimum), self.maximum))
+        self.limit = float(self.maximum)
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.peak = 0
+        self.decreases = 0
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            before = int(self.limit)
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            if int(self.limit) > before:
+                self._cond.notify()
+
+    def on_throttle(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_cut >= self.cooldown:
+                self._last_cut = now
+                self.decreases += 1
+                self.limit = max(float(self.minimum), self.limit / 2)
+
+POLLY_CONCURRENCY = AdaptiveConcurrency(POLLY_MAX_INFLIGHT)
+RETRY_COUNTS = {"calls": 0, "retried": 0, "throttle": 0, "transient": 0, "gave_up": 0}
+_RETRY_COUNTS_LOCK = threading.Lock()
+
+def _count(name):
+    with _RETRY_COUNTS_LOCK:
+        RETRY_COUNTS[name] += 1
+
+def retry_stats():
+    with _RETRY_COUNTS_LOCK:
+        counts = ", ".join(f"{name} {n}" for name, n in RETRY_COUNTS.items())
+    c = POLLY_CONCURRENCY
+    return f"{counts} | concurrency limit {int(c.limit)}/{c.maximum}, peak {c.peak}, cut {c.decreases}x"
+
+class _HedgeCancelled(Exception):
+    """The other copy of a hedged request finished first."""
+
+class _HedgeState:
+    def __init__(self):
+        self.sent = threading.Event()    # set when the request goes out (or the call ends without sending)
+        self.sent_at = None
+        self.cancel = threading.Event()  # set when the other copy has won
+
+    def mark_sent(self):
+        if self.sent_at is None:
+            self.sent_at = time.monotonic()
+        self.sent.set()
+
+class LatencyTracker:
+    """The last `window` successful synthesize_speech latencies per engine."""
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, engine, seconds):
+        with self._lock:
+            self._samples.setdefault(engine, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, engine, q):
+        """The q-th percentile for `engine`, or None while there are fewer than HEDGE_MIN_SAMPLES."""
+        with self._lock:
+            samples = sorted(self._samples.get(engine, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+POLLY_LATENCY = LatencyTracker()
+
+def _call_polly(pc, limiter=None, hedge=None, **kwargs):
+    """
+    synthesize_speech with the audio spooled to a temp file (positioned at 0), paced by
+    `limiter` (a TokenBucket) when one is given and capped by POLLY_CONCURRENCY.
+    Throttling and transient failures, including a reset while the audio is streaming, are
+    retried with decorrelated-jitter backoff; fatal errors and the last failure are raised.
+    `hedge` is the _HedgeState of one copy of a hedged request (see _hedged_call).
+    """
+    _count("calls")
+    delay = RETRY_BASE_DELAY
+    for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+        if hedge is not None and hedge.cancel.is_set():
+            raise _HedgeCancelled()
+        if limiter is not None:
+            limiter.acquire()
+        part = tempfile.TemporaryFile()
         try:
-            ms = max(100, min(int(m.group(1)), 400))
-        except Exception:
-            ms = 200
-        return f'<break time="{ms}ms"/>'
-    t = re.sub(r'<break\s+time="(\d+)ms"\s*/>', _clamp_break, t)
-    return t
+            with POLLY_CONCURRENCY:
+                if hedge is not None:
+                    hedge.mark_sent()
+                started = time.monotonic()
+                resp = pc.synthesize_speech(**kwargs)
+                stream = resp.get("AudioStream")
+                if not stream:
+                    raise RuntimeError("No AudioStream in response.")
+                if hedge is not None and hedge.cancel.is_set():
+                    stream.close()
+                    raise _HedgeCancelled()
+                # Spool to an anonymous temp file so memory stays flat however long the segment is
+                _copy_stream(stream, part)
+                POLLY_LATENCY.observe(kwargs.get("Engine"), time.monotonic() - started)
+        except (BotoCoreError, ClientError, OSError) as e:
+            part.close()
+            kind = classify_error(e)
+            if kind == "throttle":
+                POLLY_CONCURRENCY.on_throttle()
+                if limiter is not None:
+                    limiter.on_throttle()
+            if kind == "fatal":
+                raise
+            _count(kind)
+            if attempt == RETRY_MAX_ATTEMPTS:
+                _count("gave_up")
+                raise
+            _count("retried")
+            # Sleep outside the concurrency slot so waiting retries do not hold capacity
+            delay = min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, delay * 3))
+            time.sleep(delay)
+            continue
+        except BaseException:
+            part.close()
+            raise
+        POLLY_CONCURRENCY.on_success()
+        if limiter is not None:
+            limiter.on_success()
+        part.seek(0)
+        return part
+
+HEDGE_COUNTS = {"requests": 0, "hedged": 0, "hedge_won": 0, "primary_won": 0, "over_budget": 0, "no_capacity": 0}
+_HEDGE_LOCK = threading.Lock()
+_HEDGE_POOL = None
+
+def _hedge_pool():
+    global _HEDGE_POOL
+    with _HEDGE_LOCK:
+        if _HEDGE_POOL is None:
+            _HEDGE_POOL = ThreadPoolExecutor(max_workers=2 * POLLY_MAX_INFLIGHT, thread_name_prefix="polly-hedge")
+    return _HEDGE_POOL
+
+def hedge_delay(engine):
+    """Seconds a request may run before it is hedged: HEDGE_PERCENTILE of recent latencies."""
+    observed = POLLY_LATENCY.percentile(engine, HEDGE_PERCENTILE)
+    return max(HEDGE_MIN_DELAY, HEDGE_DEFAULT_DELAY if observed is None else observed)
+
+def _take_hedge_budget():
+    with _HEDGE_LOCK:
+        # Counting this hedge, stay within the budget: no hedging until 1 / HEDGE_BUDGET requests were seen
+        if HEDGE_COUNTS["hedged"] + 1 > HEDGE_BUDGET * HEDGE_COUNTS["requests"]:
+            HEDGE_COUNTS["over_budget"] += 1
+            return False
+        HEDGE_COUNTS["hedged"] += 1
+        return True
+
+def _discard(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def _hedged_call(pc, limiter=None, **kwargs):
+    """
+    _call_polly(), plus a duplicate request if the first has not answered within hedge_delay().
+    The first successful copy is returned; the other is told to stop and its audio is discarded.
+    Duplicates are capped at HEDGE_BUDGET of requests and only use idle POLLY_CONCURRENCY slots.
+    """
+    with _HEDGE_LOCK:
+        HEDGE_COUNTS["requests"] += 1
+    primary = _HedgeState()
+    first = _hedge_pool().submit(_call_polly, pc, limiter, hedge=primary, **kwargs)
+    first.add_done_callback(lambda f: primary.sent.set())
+    copies = {first: primary}
+
+    # The hedge clock starts when the request is sent, not while it queues for a slot or token
+    primary.sent.wait()
+    elapsed = time.monotonic() - (primary.sent_at or time.monotonic())
+    done, _ = wait([first], timeout=max(0.0, hedge_delay(kwargs.get("Engine")) - elapsed))
+    if not done:
+        if POLLY_CONCURRENCY.inflight >= int(POLLY_CONCURRENCY.limit):
+            with _HEDGE_LOCK:
+                HEDGE_COUNTS["no_capacity"] += 1
+        elif _take_hedge_budget():
+            backup = _HedgeState()
+            copies[_hedge_pool().submit(_call_polly, pc, limiter, hedge=backup, **kwargs)] = backup
+
+    pending, error = set(copies), None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((f for f in done if f.exception() is None), None)
+        if winner is None:
+            e = next(iter(done)).exception()
+            if classify_error(e) == "fatal":
+                error = e
+                break  # the other copy would be rejected the same way
+            error = error or e
+            continue
+        for f in (done | pending) - {winner}:
+            copies[f].cancel.set()
+            f.cancel()
+            f.add_done_callback(_discard)
+        if len(copies) > 1:
+            with _HEDGE_LOCK:
+                HEDGE_COUNTS["primary_won" if winner is first else "hedge_won"] += 1
+        return winner.result()
+    for f in pending:
+        copies[f].cancel.set()
+        f.cancel()
+        f.add_done_callback(_discard)
+    raise error
+
+def hedge_stats():
+    with _HEDGE_LOCK:
+        return ", ".join(f"{name} {n}" for name, n in HEDGE_COUNTS.items())
+
+# What each engine accepts: tag -> {attribute: allowed values, or None for any value}.
+# Checked locally by validate_ssml() so unsupported markup never costs a round trip.
+SSML_CAPABILITIES = {
+    "standard": {
+        "speak": {}, "p": {}, "s": {}, "break": {"time": None, "strength": None},
+        "emphasis": {"level": None}, "lang": {"xml:lang": None, "onlangfailure": None}, "mark": {"name": None},
+        "phoneme": {"alphabet": None, "ph": None},
+        "prosody": {"rate": None, "pitch": None, "volume": None, "amazon:max-duration": None},
+        "say-as": {"interpret-as": None, "format": None, "detail": None}, "sub": {"alias": None}, "w": {"role": None},
+        "amazon:effect": {"name": ("drc", "whispered"), "phonation": None, "vocal-tract-length": None},
+        "amazon:auto-breaths": {"volume": None, "frequency": None, "duration": None},
+        "amazon:breath": {"volume": None, "duration": None},
+    },
+    "neural": {
+        "speak": {}, "p": {}, "s": {}, "break": {"time": None, "strength": None},
+        "lang": {"xml:lang": None, "onlangfailure": None}, "mark": {"name": None},
+        "phoneme": {"alphabet": None, "ph": None},
+        "prosody": {"rate": None, "volume": None, "amazon:max-duration": None},
+        "say-as": {"interpret-as": None, "format": None, "detail": None}, "sub": {"alias": None}, "w": {"role": None},
+        "amazon:effect": {"name": ("drc",)}, "amazon:domain": {"name": ("news", "conversational")},
+    },
+    "generative": {
+        "speak": {}, "p": {}, "s": {}, "break": {"time": None, "strength": None},
+        "lang": {"xml:lang": None}, "say-as": {"interpret-as": None, "format": None}, "sub": {"alias": None},
+    },
+    "long-form": {
+        "speak": {}, "p": {}, "s": {}, "break": {"time": None, "strength": None},
+        "lang": {"xml:lang": None}, "phoneme": {"alphabet": None, "ph": None},
+        "say-as": {"interpret-as": None, "format": None, "detail": None}, "sub": {"alias": None}, "w": {"role": None},
+    },
+}
+MAX_BREAK_MS = 10_000  # Polly rejects longer <break time="…"/>
+
+def _profile_from_capabilities(engine, breaks, wrap):
+    """A sanitize_ssml() profile keeping exactly the tags and attributes SSML_CAPABILITIES[engine] allows."""
+    known = {}
+    for engine_caps in SSML_CAPABILITIES.values():
+        for tag, attrs in engine_caps.items():
+            known.setdefault(tag, set()).update(attrs)
+    caps = SSML_CAPABILITIES[engine]
+    drop = {tag: tuple(sorted(known[tag] - set(attrs))) for tag, attrs in caps.items()}
+    return {"keep": tuple(caps), "strip": (), "drop_attrs": {tag: attrs for tag, attrs in drop.items() if attrs},
+            "breaks": breaks, "wrap": wrap}
+
+# Per-engine SSML rules, applied by sanitize_ssml() in a single pass over the document. Engine profiles
+# are derived from SSML_CAPABILITIES, so the sanitizer and validate_ssml() agree on every tag.
+#   keep       - tags allowed through (None = every tag not listed in strip)
+#   strip      - tags whose markup is removed while their inner text is kept ("amazon:*" = prefix)
+#   drop_attrs - attributes removed from a kept tag
+#   breaks     - (min_ms, max_ms) clamp for <break time="Nms"/>, or None to leave breaks alone
+#   wrap       - normalise the result to exactly one outer <speak>…</speak>
+SSML_PROFILES = {
+    "standard": _profile_from_capabilities("standard", breaks=None, wrap=False),
+    "neural": _profile_from_capabilities("neural", breaks=(100, 400), wrap=False),
+    "generative": _profile_from_capabilities("generative", breaks=(100, 400), wrap=True),
+    "long-form": _profile_from_capabilities("long-form", breaks=(100, 400), wrap=True),
+    # The last-resort fallback: a subset every engine accepts
+    "neural-minimal": {
+        "keep": ("speak", "p", "s", "break"), "strip": (), "drop_attrs": {}, "breaks": (100, 400), "wrap": True,
+    },
+}
+
+_SSML_MARKUP_RE = re.compile(r"(<!--.*?-->|<[^<>]*>)", re.DOTALL)
+_SSML_TAG_RE = re.compile(r"<\s*(/?)\s*([\w:.-]+)(.*?)(/?)\s*>$", re.DOTALL)
+_BREAK_MS_RE = re.compile(r'\btime\s*=\s*"(\d+)ms"')
+_LEADING_SPEAK_RE = re.compile(r"\s*<\s*speak\b[^>]*>", re.IGNORECASE)
+_TRAILING_SPEAK_RE = re.compile(r"<\s*/\s*speak\s*>\s*$", re.IGNORECASE)
+
+def _compile_profile(profile):
+    strip = profile["strip"]
+    return {
+        "keep": frozenset(profile["keep"]) if profile["keep"] is not None else None,
+        "strip": frozenset(t for t in strip if not t.endswith("*")),
+        "strip_prefixes": tuple(t[:-1] for t in strip if t.endswith("*")),
+        "drop_attrs": {tag: re.compile(r'\s+(?:%s)\s*=\s*"[^"]*"' % "|".join(map(re.escape, attrs)))
+                       for tag, attrs in profile["drop_attrs"].items()},
+        "breaks": profile["breaks"],
+        "wrap": profile["wrap"],
+    }
+
+_COMPILED_PROFILES = {name: _compile_profile(p) for name, p in SSML_PROFILES.items()}
+
+def _rewrite_markup(tok, rules):
+    """What one comment or tag becomes under a compiled profile ("" removes it)."""
+    if tok.startswith("<!--"):
+        return ""
+    tm = _SSML_TAG_RE.match(tok)
+    if not tm:
+        return tok
+    closing, name, attrs, self_closing = tm.groups()
+    name = name.lower()
+    if rules["wrap"] and name == "speak":
+        return ""  # the single outer <speak> is re-added by sanitize_ssml()
+    keep = rules["keep"]
+    if (name in rules["strip"] or (rules["strip_prefixes"] and name.startswith(rules["strip_prefixes"]))
+            or (keep is not None and name not in keep)):
+        return ""
+    breaks = rules["breaks"]
+    if name == "break" and breaks and self_closing:
+        bm = _BREAK_MS_RE.search(attrs)
+        if bm:
+            return f'<break time="{max(breaks[0], min(int(bm.group(1)), breaks[1]))}ms"/>'
+    drop = rules["drop_attrs"].get(name)
+    if drop is not None and not closing:
+        return f"<{name}{drop.sub('', attrs)}{self_closing}>"
+    return tok
+
+def _rewrite_body(text, rules):
+    # split() tokenizes in C into [text, markup, text, markup, ...]; each distinct tag is rewritten
+    # once and the replacements are mapped back in, so per-tag Python work is per unique tag only
+    parts = _SSML_MARKUP_RE.split(text)
+    markup = parts[1::2]
+    rewrite = {tok: _rewrite_markup(tok, rules) for tok in set(markup)}
+    parts[1::2] = map(rewrite.__getitem__, markup)
+    return "".join(parts)
+
+def sanitize_ssml(ssml_text: str, profile: str) -> str:
+    """
+    Sanitize SSML for an engine profile from SSML_PROFILES (unknown engines use "standard").
+    The document is tokenized once and every comment/tag is rewritten from the profile table;
+    text between tags is copied untouched.
+    """
+    rules = _COMPILED_PROFILES.get(profile) or _COMPILED_PROFILES["standard"]
+    if not rules["wrap"]:
+        return _rewrite_body(ssml_text, rules)
+    # Only the body between an outer <speak> and </speak> is kept; whitespace outside them is dropped
+    start, end = 0, len(ssml_text)
+    lead = _LEADING_SPEAK_RE.match(ssml_text)
+    if lead:
+        start = lead.end()
+    trail = _TRAILING_SPEAK_RE.search(ssml_text, max(start, end - 256))
+    if trail:
+        end = trail.start()
+    inner = _rewrite_body(ssml_text[start:end], rules)
+    if not lead:
+        inner = inner.lstrip()
+    if not trail:
+        inner = inner.rstrip()
+    return f"<speak>{inner}</speak>"
+
+def sanitize_ssml_for_neural(ssml_text: str) -> str:
+    # Tags and attributes outside SSML_CAPABILITIES["neural"] out; breaks clamped to 100–400ms
+    return sanitize_ssml(ssml_text, "neural")
 
 def sanitize_ssml_for_neural_minimal(ssml_text: str) -> str:
     """
     Aggressive sanitization: keep only <speak>, <p>, <s>, and <break time="Nms"/>.
     Strip all other tags and attributes to maximize Neural compatibility.
     """
-    t = ssml_text
-    # Remove comments and amazon:* wrappers
-    t = re.sub(r"<!--.*?-->", "", t, flags=re.DOTALL)
-    t = re.sub(r"</?amazon:[^>]+>", "", t)
-    # Remove phoneme entirely keeping inner text
-    t = re.sub(r"<phoneme[^>]*>(.*?)</phoneme>", r"\1", t, flags=re.DOTALL)
-    # Remove all prosody, emphasis, say-as and any other tags except speak/p/s/break
-    t = re.sub(r"</?(prosody|emphasis|say-as|sub|mark|audio|lang|w|voice)[^>]*>", "", t, flags=re.IGNORECASE)
-    # Normalize break tags, remove attributes except time and clamp
-    def _normalize_break(m):
+    return sanitize_ssml(ssml_text, "neural-minimal")
+
+def strip_all_tags(ssml_text: str) -> str:
+    # Convert SSML to plain text for engines that reject SSML entirely
+    t = _SSML_MARKUP_RE.sub(" ", ssml_text)
+    t = re.sub(r"\s+", " ", t).strip()
+    return xml_unescape(t, {"&quot;": '"', "&apos;": "'"})
+
+
+_AMAZON_NS = "https://aws.amazon.com/polly/ssml"  # only used to bind the amazon: prefix for the parser
+_NS_PREFIXES = {_AMAZON_NS: "amazon", "http://www.w3.org/XML/1998/namespace": "xml"}
+_BREAK_TIME_RE = re.compile(r"\s*(\d+(?:\.\d+)?)\s*(ms|s)\s*$")
+
+def _ssml_name(qname):
+    # "{ns}local" from ElementTree back to the "prefix:local" spelling used in SSML_CAPABILITIES
+    if qname.startswith("{"):
+        ns, local = qname[1:].split("}", 1)
+        return f"{_NS_PREFIXES.get(ns, ns)}:{local}"
+    return qname
+
+def _parse_ssml(ssml_text):
+    # Polly SSML uses amazon:* without declaring the namespace; declare it so the XML parser accepts it
+    head = _LEADING_SPEAK_RE.match(ssml_text)
+    if head and "xmlns:amazon" not in head.group(0) and not head.group(0).endswith("/>"):
+        ssml_text = f'{ssml_text[:head.end() - 1]} xmlns:amazon="{_AMAZON_NS}">{ssml_text[head.end():]}'
+    root = ET.fromstring(ssml_text)
+    if _ssml_name(root.tag) != "speak":
+        raise ET.ParseError("root element is not <speak>")
+    return root
+
+def _ssml_features(root):
+    features = set()
+    for el in root.iter():
+        tag = _ssml_name(el.tag)
+        features.add((tag, None))
+        features.update((tag, _ssml_name(qattr)) for qattr in el.attrib)
+    return features
+
+def ssml_features(ssml_text):
+    """Every (tag, None) and (tag, attribute) pair used in `ssml_text`; empty if it is not well-formed."""
+    try:
+        return _ssml_features(_parse_ssml(ssml_text))
+    except ET.ParseError:
+        return set()
+
+def _ssml_issues(ssml_text, engine, voice=None):
+    """
+    The (tag, attribute) pairs in `ssml_text` that `engine` does not accept; attribute None means the
+    tag itself is unsupported (or used with an unsupported value). With `voice`, features Polly has
+    rejected for that voice before (CAPABILITY_STORE) count too. Raises ET.ParseError if not well-formed.
+    """
+    caps = SSML_CAPABILITIES.get(engine) or SSML_CAPABILITIES["standard"]
+    root = _parse_ssml(ssml_text)
+    issues = set()
+    for el in root.iter():
+        tag = _ssml_name(el.tag)
+        allowed = caps.get(tag)
+        if allowed is None:
+            issues.add((tag, None))
+            continue
+        for qattr, value in el.attrib.items():
+            attr = _ssml_name(qattr)
+            if attr not in allowed:
+                issues.add((tag, attr))
+            elif allowed[attr] is not None and value not in allowed[attr]:
+                issues.add((tag, None))
+            elif tag == "break" and attr == "time":
+                bm = _BREAK_TIME_RE.match(value)
+                if not bm or float(bm.group(1)) * (1 if bm.group(2) == "ms" else 1000) > MAX_BREAK_MS:
+                    issues.add((tag, attr))
+    if voice is not None and CAPABILITY_STORE is not None:
+        issues |= CAPABILITY_STORE.rejected(voice, engine, _ssml_features(root))
+    return issues
+
+def validate_ssml(ssml_text: str, engine: str, voice=None):
+    """
+    Check SSML locally against SSML_CAPABILITIES[engine] (and, given `voice`, what Polly has rejected
+    for it before). Returns a list of problems (e.g. "<emphasis>", "<prosody pitch>", "not well-formed: …");
+    an empty list means it should be accepted.
+    """
+    try:
+        issues = _ssml_issues(ssml_text, engine, voice)
+    except ET.ParseError as e:
+        return [f"not well-formed: {e}"]
+    return sorted(map(_feature_label, issues))
+
+def conform_ssml(ssml_text: str, engine: str, voice=None) -> str:
+    """
+    Remove only what `engine` (or `voice` on it) would reject: unsupported tags are unwrapped
+    (their text is kept) and unsupported attributes dropped. Well-formedness problems are left for the caller.
+    """
+    try:
+        issues = _ssml_issues(ssml_text, engine, voice)
+    except ET.ParseError:
+        return ssml_text
+    if not issues:
+        return ssml_text
+    drop_attrs = {}
+    for tag, attr in issues:
+        if attr is not None:
+            drop_attrs.setdefault(tag, []).append(attr)
+    rules = _compile_profile({
+        "keep": None, "strip": tuple(tag for tag, attr in issues if attr is None),
+        "drop_attrs": drop_attrs, "breaks": None, "wrap": False,
+    })
+    return _rewrite_body(ssml_text, rules)
+
+SSML_ROUTES = {"as-is": 0, "conformed": 0, "minimal": 0, "standard": 0, "text": 0}
+_SSML_ROUTES_LOCK = threading.Lock()
+
+def plan_ssml_segment(seg: str, voice: str, engine: str):
+    """
+    Decide how one SSML segment is sent before any request is made, using validate_ssml():
+    as-is, trimmed to what the engine accepts, minimally sanitized, on the standard engine,
+    or as plain text. Returns (text, text_type, engine).
+    Rejections learned for this voice in CAPABILITY_STORE steer the choice the same way.
+    """
+    def _route(name, text, text_type, eng):
+        with _SSML_ROUTES_LOCK:
+            SSML_ROUTES[name] += 1
+        return text, text_type, eng
+
+    if CAPABILITY_STORE is not None:
+        CAPABILITY_STORE.count_hits(voice, engine, ssml_features(seg))
+    if not validate_ssml(seg, engine, voice):
+        return _route("as-is", seg, "ssml", engine)
+    conformed = conform_ssml(seg, engine, voice)
+    if not validate_ssml(conformed, engine, voice):
+        return _route("conformed", conformed, "ssml", engine)
+    minimal = sanitize_ssml_for_neural_minimal(seg)
+    if not validate_ssml(minimal, engine, voice):
+        return _route("minimal", minimal, "ssml", engine)
+    if engine != "standard" and not validate_ssml(seg, "standard", voice):
         try:
-            ms = max(100, min(int(m.group(1)), 400))
-        except Exception:
-            ms = 200
-        return f'<break time="{ms}ms"/>'
-    t = re.sub(r'<break[^>]*time="(\d+)ms"[^>]*/>', _normalize_break, t)
-    # Remove any other tags than speak/p/s/break
-    t = re.sub(r"<(?!/?(speak|p|s|break)\b)[^>]+>", "", t, flags=re.IGNORECASE)
-    # Ensure speak wrapper
-    inner = re.sub(r"^\s*<\s*speak\s*>", "", t.strip(), flags=re.IGNORECASE)
-    inner = re.sub(r"<\s*/\s*speak\s*>\s*$", "", inner, flags=re.IGNORECASE)
-    return f"<speak>{inner}</speak>"
+            on_standard = voice_catalogue().supports(voice, "standard")
+        except (BotoCoreError, ClientError):
+            on_standard = True  # no catalogue; let the request decide
+        if on_standard:
+            return _route("standard", seg, "ssml", "standard")
+    return _route("text", strip_all_tags(seg), "text", engine)
 
-def _limit(engine: str, text_type: str) -> int:
-    base = NEURAL_LIMIT if engine == "neural" else STANDARD_LIMIT
-    return int(base * (SSML_HEADROOM if text_type == "ssml" else 1.0))
+def ssml_route_stats():
+    with _SSML_ROUTES_LOCK:
+        routes = ", ".join(f"{name} {n}" for name, n in SSML_ROUTES.items())
+    if CAPABILITY_STORE is not None:
+        routes += f" | {CAPABILITY_STORE.stats()}"
+    return routes
 
-def split_ssml_safe(ssml_text: str, engine: str):
+class CapabilityStore:
     """
-    Split SSML only on </p> boundaries to keep tags balanced.
-    Wrap each part in <speak>…</speak> if not already wrapped.
+    SSML features Polly has rejected in practice, keyed by (voice, engine, tag, attribute) and kept
+    as JSON at `path`. validate_ssml() treats them like gaps in SSML_CAPABILITIES for that voice, so
+    each rejection costs a round trip once instead of once per segment per run. Entries expire after
+    `ttl` seconds and are dropped as soon as Polly accepts the feature for that voice.
+    """
+    def __init__(self, path, ttl=CAPABILITY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.saved_requests = 0   # segments rerouted by a learned rejection, i.e. failed calls avoided
+        self._entries = {}        # (voice, engine, tag, attr) -> {"hits": n, "learned_at": epoch seconds}
+        self._dirty = False
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                for row in json.load(f).get("rejections", []):
+                    key = (row["voice"], row["engine"], row["tag"], row.get("attr"))
+                    self._entries[key] = {"hits": row.get("hits", 0), "learned_at": row.get("learned_at", 0)}
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        self._expire()
+
+    def _expire(self):
+        # Caller holds the lock (or is __init__); stale rejections are forgotten and retried
+        cutoff = time.time() - self.ttl
+        stale = [key for key, entry in self._entries.items() if entry["learned_at"] < cutoff]
+        for key in stale:
+            del self._entries[key]
+        self._dirty = self._dirty or bool(stale)
+
+    def rejected(self, voice, engine, features):
+        """The (tag, attr) pairs among `features` Polly has rejected for `voice` on `engine`."""
+        with self._lock:
+            self._expire()
+            return {f for f in features if (voice, engine) + f in self._entries}
+
+    def knows(self, voice, engine):
+        """Whether any rejection is stored for `voice` on `engine`."""
+        with self._lock:
+            return any(key[:2] == (voice, engine) for key in self._entries)
+
+    def count_hits(self, voice, engine, features):
+        with self._lock:
+            self._expire()
+            keys = [(voice, engine) + f for f in features if (voice, engine) + f in self._entries]
+            for key in keys:
+                self._entries[key]["hits"] += 1
+            if keys:
+                self.saved_requests += 1
+                self._dirty = True
+
+    def record(self, voice, engine, features):
+        """Remember that a request using `features` was rejected for `voice` on `engine`."""
+        with self._lock:
+            new = [(voice, engine) + f for f in features if (voice, engine) + f not in self._entries]
+            for key in new:
+                self._entries[key] = {"hits": 0, "learned_at": time.time()}
+            self._dirty = self._dirty or bool(new)
+        if new:
+            print(f"[LEARN] {voice}/{engine} rejects: {', '.join(sorted(_feature_label(k[2:]) for k in new))}")
+            self.save()
+
+    def forget(self, voice, engine, features):
+        """Drop learned rejections among `features`, which Polly has just accepted for `voice` on `engine`."""
+        with self._lock:
+            gone = [(voice, engine) + f for f in features if (voice, engine) + f in self._entries]
+            for key in gone:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(gone)
+        if gone:
+            print(f"[LEARN] {voice}/{engine} accepts again: {', '.join(sorted(_feature_label(k[2:]) for k in gone))}")
+            self.save()
+
+    def hit_counts(self):
+        """{"voice/engine <tag attr>": hits} for every learned rejection."""
+        with self._lock:
+            return {f"{v}/{e} {_feature_label((t, a))}": entry["hits"]
+                    for (v, e, t, a), entry in sorted(self._entries.items(), key=str)}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [{"voice": v, "engine": e, "tag": t, "attr": a, **entry}
+                    for (v, e, t, a), entry in sorted(self._entries.items(), key=str)]
+            self._dirty = False
+        try:
+            ensure_dirs(os.path.dirname(self.path) or ".")
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"rejections": rows}, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[WARN] Could not save SSML capability store at {self.path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            hits = sum(entry["hits"] for entry in self._entries.values())
+            return (f"{len(self._entries)} learned rejections, {hits} hits, "
+                    f"{self.saved_requests} failing requests avoided this run")
+
+def _feature_label(feature):
+    tag, attr = feature
+    return f"<{tag}>" if attr is None else f"<{tag} {attr}>"
+
+def _is_ssml_rejection(e) -> bool:
+    msg = str(e)
+    return "InvalidSsmlException" in msg or "Unsupported Neural" in msg
+
+# Tags every engine needs; a rejection is never blamed on them
+_STRUCTURAL_TAGS = frozenset(("speak", "p", "s", "break"))
+
+def _learn_rejection(voice, engine, rejected, accepted):
+    # A rejected request only says "something in here". Blame a feature only when the accepted retry
+    # is the rejected document minus exactly that one tag (with its attributes) or one attribute
+    if CAPABILITY_STORE is None:
+        return
+    before, after = ssml_features(rejected), ssml_features(accepted)
+    diff = before ^ after
+    tags = {tag for tag, _ in diff}
+    if not diff or after - before or len(tags) != 1 or tags & _STRUCTURAL_TAGS:
+        return
+    tag = tags.pop()
+    if (tag, None) in diff:
+        CAPABILITY_STORE.record(voice, engine, {(tag, None)})
+    elif len(diff) == 1:
+        CAPABILITY_STORE.record(voice, engine, diff)
+
+def _learn_acceptance(voice, engine, accepted):
+    # Whatever Polly just accepted is no longer rejected for this voice, whatever was learned before
+    if CAPABILITY_STORE is not None and CAPABILITY_STORE.knows(voice, engine):
+        CAPABILITY_STORE.forget(voice, engine, ssml_features(accepted))
+
+CAPABILITY_STORE = CapabilityStore(CAPABILITY_STORE_PATH) if CAPABILITY_STORE_PATH else None
+
+def _limit(engine: str) -> int:
+    # Budget in billed characters; for SSML only the text between tags counts against it
+    return NEURAL_LIMIT if engine == "neural" else STANDARD_LIMIT
+
+_TEXT_PIECE_RE = re.compile(r"\S+\s*|\s+")
+_SENTENCE_END_RE = re.compile(r"[\.\!\?][\"'”’)\]]*\s*$")
+# Break strength after a piece: end of paragraph > end of <s> > sentence punctuation / <break/> > word
+_BREAK_AFTER_TAG = {"p": 4, "s": 3}
+
+def _ssml_pieces(body):
+    """
+    Yield (raw, billed_chars, kind, name, break_priority) for each tag and word of an SSML body.
+    kind is "open", "close", "empty" (self-closing/comment) or "text".
+    """
+    for tok in _SSML_MARKUP_RE.split(body):
+        if not tok:
+            continue
+        if tok[0] == "<" and tok[-1] == ">":
+            tm = _SSML_TAG_RE.match(tok)
+            if tok.startswith("<!--") or not tm:
+                yield tok, 0, "empty", None, 0
+                continue
+            closing, name, _, self_closing = tm.groups()
+            name = name.lower()
+            if closing:
+                yield tok, 0, "close", name, _BREAK_AFTER_TAG.get(name, 0)
+            elif self_closing:
+                yield tok, 0, "empty", name, 2 if name == "break" else 0
+            else:
+                yield tok, 0, "open", name, 0
+            continue
+        for m in _TEXT_PIECE_RE.finditer(tok):
+            piece = m.group()
+            yield piece, len(piece), "text", None, 2 if _SENTENCE_END_RE.search(piece) else 1
+
+def split_ssml_safe(ssml_text: str, engine: str, limit=None, max_chars=MAX_REQUEST_CHARS):
     """
-    lim = _limit(engine, "ssml")
+    Pack SSML into as few requests as possible, each wrapped in <speak>…</speak>.
+    Chunks are measured the way Polly bills them (text only, tags excluded) against `limit`
+    (default _limit()), and in total characters against `max_chars`. Cuts prefer </p>, then </s>, then sentence
+    ends, then words; tags open at a cut are closed at the end of one chunk and reopened at the
+    start of the next, so every chunk stays balanced.
+    """
+    lim = limit or _limit(engine)
     cleaned = ssml_text.strip()
+    lead = _LEADING_SPEAK_RE.match(cleaned)
+    trail = _TRAILING_SPEAK_RE.search(cleaned, max(0, len(cleaned) - 256))
+    body = cleaned[lead.end() if lead else 0:trail.start() if trail else len(cleaned)]
 
-    # If small enough, use as-is
-    if len(cleaned) <= lim:
+    pieces = list(_ssml_pieces(body))
+    billed_total = sum(p[1] for p in pieces)
+    if billed_total <= lim and len(cleaned) <= max_chars:
         return [cleaned]
 
-    # Split on </p> boundaries (keep the closing tag)
-    parts = re.split(r"(?<=</p>)\s*", cleaned)
-    chunks, buf = [], ""
-    for part in parts:
-        # Ensure each piece is self-contained without outer <speak>, so we can wrap it
-        part_inner = re.sub(r"^\s*<\s*speak\s*>", "", part.strip(), flags=re.IGNORECASE)
-        part_inner = re.sub(r"<\s*/\s*speak\s*>\s*$", "", part_inner, flags=re.IGNORECASE)
-        candidate = (buf + part_inner)
-        if len(candidate) <= lim:
-            buf = candidate
-        else:
-            if buf:
-                chunks.append(f"<speak>{buf}</speak>")
-            buf = part_inner
-    if buf:
-        chunks.append(f"<speak>{buf}</speak>")
+    # Prefix sums over pieces so any candidate chunk is measured in O(1)
+    billed_at, raw_at = [0], [0]
+    for raw, billed, *_ in pieces:
+        billed_at.append(billed_at[-1] + billed)
+        raw_at.append(raw_at[-1] + len(raw))
+
+    # Open-tag stack as immutable cons cells (raw, name, parent, reopen+close overhead): O(1) snapshots
+    chunks = []
+    stack = None
+    start, start_stack = 0, None
+    best = {}  # break priority -> (position, stack at that position)
+    wrapper = len("<speak></speak>")
+
+    def _overhead(st):
+        return st[3] if st else 0
+
+    def _emit(cut, cut_stack):
+        opens, node = [], start_stack
+        while node:
+            opens.append(node[0])
+            node = node[2]
+        closes, node = [], cut_stack
+        while node:
+            closes.append(f"</{node[1]}>")
+            node = node[2]
+        inner = "".join(opens[::-1]) + "".join(p[0] for p in pieces[start:cut]) + "".join(closes)
+        if inner.strip():
+            chunks.append(f"<speak>{inner}</speak>")
+
+    def _fits(end):
+        raw = raw_at[end] - raw_at[start] + _overhead(start_stack) + _overhead(stack) + wrapper
+        return billed_at[end] - billed_at[start] <= lim and raw <= max_chars
+
+    for i, (raw, billed, kind, name, prio) in enumerate(pieces):
+        while not _fits(i + 1) and i > start:
+            candidates = [(pr, pos, st) for pr, (pos, st) in best.items() if pos > start]
+            full = [c for c in candidates if billed_at[c[1]] - billed_at[start] >= lim * PACK_MIN_FILL]
+            if full:
+                _, cut, cut_stack = max(full)
+            elif candidates:
+                _, cut, cut_stack = max(candidates, key=lambda c: c[1])
+            else:
+                cut, cut_stack = i, stack
+            _emit(cut, cut_stack)
+            start, start_stack = cut, cut_stack
+            best = {pr: v for pr, v in best.items() if v[0] > start}
+        if kind == "open":
+            stack = (raw, name, stack, _overhead(stack) + len(raw) + len(name) + 3)
+        elif kind == "close":
+            node = stack
+            while node and node[1] != name:
+                node = node[2]
+            stack = node[2] if node else stack
+        if prio:
+            best[prio] = (i + 1, stack)
+    _emit(len(pieces), stack)
 
     # Fallback: if we somehow produced nothing, return original (Polly will throw a length error)
     return chunks or [cleaned]
 
-def split_plain_text(text: str, engine: str):
-    lim = _limit(engine, "text")
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[\.\!\?])\s+")
+_SEP_RE = re.compile(r"[,\s]")
+_LAST_SEP_RE = re.compile(r".*[,\s]", re.DOTALL)
+
+def split_plain_text(text: str, engine: str, limit=None):
+    """
+    Pack sentences into chunks of at most `limit` (default _limit()) characters in a single pass.
+    Chunks are sliced from (start, end) offsets and joined once, so the cost stays linear for
+    book-length input. A sentence longer than the limit is cut at commas/whitespace.
+    """
+    lim = limit or _limit(engine)
+    text = text.strip()
     parts = []
-    sentences = re.split(r'(?<=[\.\!\?])\s+', text.strip())
-    buf = ""
-    for s in sentences:
-        s = s.strip()
-        if not s:
+    spans, buf_len = [], 0  # sentences in the current chunk; they are joined with single spaces
+
+    def _split_long(a, b):
+        # Greedy over comma/whitespace tokens: each piece ends at the last token boundary that fits
+        while b - a > lim:
+            m = _LAST_SEP_RE.match(text, a, a + lim + 1)
+            if m:
+                q = m.end() - 1  # last separator in the window
+                cut = q + 1 if q + 1 <= a + lim else q
+            else:
+                # The first word alone is over the limit: it becomes its own piece
+                m = _SEP_RE.search(text, a, b)
+                cut = m.start() if m else b
+            parts.append(text[a:cut])
+            a = cut
+        if b > a:
+            parts.append(text[a:b])
+
+    pos, end = 0, len(text)
+    breaks = _SENTENCE_BREAK_RE.finditer(text)
+    while pos <= end:
+        m = next(breaks, None)
+        a, b = pos, (m.start() if m else end)
+        pos = m.end() if m else end + 1
+        while a < b and text[a].isspace():
+            a += 1
+        while b > a and text[b - 1].isspace():
+            b -= 1
+        n = b - a
+        if not n:
+            continue
+        if (buf_len + 1 + n if spans else n) <= lim:
+            buf_len = buf_len + 1 + n if spans else n
+            spans.append((a, b))
             continue
-        candidate = (buf + " " + s).strip() if buf else s
-        if len(candidate) <= lim:
-            buf = candidate
+        if spans:
+            parts.append(" ".join(text[x:y] for x, y in spans))
+        spans, buf_len = [], 0
+        if n > lim:
+            _split_long(a, b)
         else:
-            if buf: parts.append(buf)
-            # If a single sentence is longer than limit, split on commas/spaces
-            if len(s) > lim:
-                chunks = re.split(r'(,|\s)', s)
-                sub = ""
-                for c in chunks:
-                    nxt = (sub + c)
-                    if len(nxt) > lim and sub:
-                        parts.append(sub)
-                        sub = c
-                    else:
-                        sub = nxt
-                if sub: parts.append(sub)
-                buf = ""
-            else:
-                buf = s
-    if buf: parts.append(buf)
+            spans, buf_len = [(a, b)], n
+    if spans:
+        parts.append(" ".join(text[x:y] for x, y in spans))
     return parts
 
-def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE):
-    pc = polly_client()
+def _copy_stream(stream, dst, chunk_size=STREAM_CHUNK_SIZE):
+    """Copy a file-like AudioStream into dst in fixed-size chunks; returns the byte count."""
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return total
+        dst.write(chunk)
+        total += len(chunk)
 
-    # Prepare segments
-    if text_type == "ssml":
-        ssml = text
-        if engine == "neural":
-            ssml = sanitize_ssml_for_neural(ssml)
-            # If still too long, split by paragraphs safely
-            segments = split_ssml_safe(ssml, engine)
-        else:
-            # Standard supports more SSML features; still split safely if needed
-            segments = split_ssml_safe(ssml, engine)
-    else:
-        segments = split_plain_text(text, engine)
+_UMASK = os.umask(0o022)  # read once at import; os.umask() can only be queried by setting it
+os.umask(_UMASK)
 
-    audio_bytes = b""
-    for idx, seg in enumerate(segments, 1):
+@contextmanager
+def atomic_output(outpath):
+    """
+    Yield a temp file next to outpath and rename it into place only when the block succeeds,
+    so a crash or Ctrl-C never leaves a half-written file at the final path.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(outpath)}.", suffix=".part",
+                               dir=os.path.dirname(outpath) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the mode of the file being replaced, else what open() would give
         try:
-            resp = pc.synthesize_speech(
-                Text=seg,
-                TextType=text_type,
-                VoiceId=voice,
-                Engine=engine,
-                OutputFormat=output_format,
-                SampleRate=sample_rate
-            )
-        except (BotoCoreError, ClientError) as e:
-            # If neural SSML fails due to unsupported neural features, try minimal sanitize on neural,
-            # then try standard, and finally fall back to another Indian voice that supports the engine.
-            msg = str(e)
-            if text_type == "ssml" and engine == "neural" and ("InvalidSsmlException" in msg or "Unsupported Neural" in msg):
-                minimally_sanitized = sanitize_ssml_for_neural_minimal(seg)
+            mode = os.stat(outpath).st_mode & 0o777
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, outpath)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+class SegmentCache:
+    """
+    Content-addressed store of synthesized segment audio, keyed by a hash of everything that shapes
+    the Polly request. Least-recently-used entries are evicted once the store exceeds max_bytes.
+    """
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = None  # key -> [size, last_used], built lazily from disk
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text, text_type, voice, engine, output_format, sample_rate):
+        blob = json.dumps([text, text_type, voice, engine, output_format, str(sample_rate)], ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith("."):  # in-flight atomic_output temp files
+                    continue
                 try:
-                    resp = pc.synthesize_speech(
-                        Text=minimally_sanitized, TextType=text_type, VoiceId=voice, Engine="neural",
+                    st = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                self._index[name] = [st.st_size, st.st_mtime]
+        self._total = sum(size for size, _ in self._index.values())
+
+    def _drop(self, key):
+        size, _ = self._index.pop(key, (0, 0))
+        self._total -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        # Trim to 90% so a full cache does not re-sort on every put
+        target = self.max_bytes * 0.9
+        for key, _ in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= target:
+                break
+            self._drop(key)
+
+    def warm(self):
+        """Read the on-disk index now rather than on the first lookup."""
+        with self._lock:
+            self._load_index()
+
+    def open(self, key):
+        """Return a readable file for a cached segment, or None on a miss."""
+        with self._lock:
+            self._load_index()
+            entry = self._index.get(key)
+            try:
+                f = open(self._path(key), "rb") if entry else None
+            except OSError:
+                self._drop(key)
+                f = None
+            if f is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry[1] = now = time.time()
+        try:
+            os.utime(self._path(key), (now, now))  # keeps LRU order across runs
+        except OSError:
+            pass
+        return f
+
+    def put(self, key, src):
+        """Copy the spooled segment `src` into the cache and rewind it for the caller."""
+        path = self._path(key)
+        ensure_dirs(os.path.dirname(path))
+        src.seek(0)
+        with atomic_output(path) as out:
+            size = _copy_stream(src, out)
+        src.seek(0)
+        with self._lock:
+            self._load_index()
+            if key in self._index:
+                self._total -= self._index[key][0]
+            self._index[key] = [size, time.time()]
+            self._total += size
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._index or {})
+        return f"{self.hits} hits, {self.misses} misses, {entries} entries, {self._total / 1e6:.1f} MB"
+
+SEGMENT_CACHE = SegmentCache(SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES) if SEGMENT_CACHE_MAX_BYTES else None
+
+def _synthesize_segment(pc, seg, idx, *, text_type, voice, engine, output_format, sample_rate, limiter=None,
+                        hedge=False):
+    """
+    Synthesize one segment and return its audio as a spooled temp file positioned at 0.
+    Unsupported-SSML failures walk the fallback ladder for this segment only.
+    Segments already in SEGMENT_CACHE are served from disk without calling Polly; audio that a fallback
+    rendered with a different voice or engine is not cached.
+    With `hedge`, slow requests are duplicated (see _hedged_call).
+    """
+    call = _hedged_call if hedge else _call_polly
+    cache_key = None
+    if SEGMENT_CACHE is not None:
+        cache_key = SegmentCache.key(seg, text_type, voice, engine, output_format, sample_rate)
+        cached = SEGMENT_CACHE.open(cache_key)
+        if cached is not None:
+            return cached
+
+    # SSML is checked locally first, so markup the engine cannot take is never sent
+    text, send_type, send_engine = seg, text_type, engine
+    if text_type == "ssml":
+        text, send_type, send_engine = plan_ssml_segment(seg, voice, engine)
+    used_voice, used_engine = voice, send_engine
+    try:
+        part = call(
+            pc, limiter,
+            Text=text,
+            TextType=send_type,
+            VoiceId=voice,
+            Engine=send_engine,
+            OutputFormat=output_format,
+            SampleRate=sample_rate
+        )
+    except (BotoCoreError, ClientError) as e:
+        # If neural SSML still fails due to unsupported neural features, try minimal sanitize on neural,
+        # then try standard, and finally fall back to another Indian voice that supports the engine.
+        # A rejection is recorded in CAPABILITY_STORE when the retry pins it on one feature, so later
+        # segments and runs skip that feature.
+        if send_type == "ssml" and send_engine == "neural" and _is_ssml_rejection(e):
+            minimally_sanitized = sanitize_ssml_for_neural_minimal(seg)
+            try:
+                part = call(
+                    pc, limiter, Text=minimally_sanitized, TextType=text_type, VoiceId=voice, Engine="neural",
+                    OutputFormat=output_format, SampleRate=sample_rate
+                )
+                _learn_rejection(voice, "neural", text, minimally_sanitized)
+                _learn_acceptance(voice, "neural", minimally_sanitized)
+            except (BotoCoreError, ClientError):
+                try:
+                    part = call(
+                        pc, limiter, Text=seg, TextType=text_type, VoiceId=voice, Engine="standard",
                         OutputFormat=output_format, SampleRate=sample_rate
                     )
+                    used_engine = "standard"
+                    _learn_acceptance(voice, "standard", seg)
                 except (BotoCoreError, ClientError):
-                    try:
-                        resp = pc.synthesize_speech(
-                            Text=seg, TextType=text_type, VoiceId=voice, Engine="standard",
-                            OutputFormat=output_format, SampleRate=sample_rate
-                        )
-                    except (BotoCoreError, ClientError):
-                        fallback_voice, fallback_engine = select_indian_voice(preferred_engine="standard")
-                        resp = pc.synthesize_speech(
-                            Text=minimally_sanitized, TextType=text_type, VoiceId=fallback_voice, Engine=fallback_engine,
-                            OutputFormat=output_format, SampleRate=sample_rate
-                        )
-            else:
-                raise RuntimeError(f"synthesize_speech failed for {voice} ({engine}) seg#{idx}: {e}")
+                    fallback_voice, fallback_engine = select_indian_voice(preferred_engine="standard")
+                    part = call(
+                        pc, limiter, Text=minimally_sanitized, TextType=text_type, VoiceId=fallback_voice, Engine=fallback_engine,
+                        OutputFormat=output_format, SampleRate=sample_rate
+                    )
+                    used_voice, used_engine = fallback_voice, fallback_engine
+        else:
+            raise RuntimeError(f"synthesize_speech failed for {voice} ({send_engine}) seg#{idx}: {e}")
+    else:
+        if send_type == "ssml":
+            _learn_acceptance(voice, send_engine, text)
+
+    # Audio from another voice or engine is not what the key promises; leave it out of the cache
+    if cache_key is not None and (used_voice, used_engine) == (voice, engine):
+        SEGMENT_CACHE.put(cache_key, part)
+    return part
+
+def _write_parts(parts, out, output_format, sample_rate=SAMPLE_RATE):
+    """
+    Join segment audio into `out`. MP3 is joined frame by frame under a single Xing header
+    (per-segment ID3 and Xing/LAME frames dropped); PCM seams are trimmed and crossfaded when
+    PCM_SMOOTH_SEAMS is on; anything else is copied byte for byte.
+    """
+    if output_format == "mp3":
+        try:
+            mp3_frames.join_mp3(parts, out)
+            return
+        except ValueError as e:
+            print(f"[WARN] MP3 frame join failed ({e}); concatenating segments as-is")
+            out.seek(0)
+            out.truncate()
+    if output_format == "pcm" and PCM_SMOOTH_SEAMS and len(parts) > 1:
+        try:
+            import pcm_audio  # numpy is only needed for PCM seam smoothing
+        except ImportError:
+            print("[WARN] numpy is not installed; PCM segments joined without seam smoothing")
+        else:
+            def _samples():
+                for part in parts:
+                    part.seek(0)
+                    yield pcm_audio.from_int16(part.read())
+            for chunk in pcm_audio.smooth_joins(_samples(), int(sample_rate)):
+                out.write(pcm_audio.to_int16(chunk).tobytes())
+            return
+    for part in parts:
+        part.seek(0)
+        shutil.copyfileobj(part, out, STREAM_CHUNK_SIZE)
+
+def _map_segments(fn, segments, concurrency):
+    """
+    Run fn(idx, seg) over segments with at most `concurrency` calls in flight.
+    Results come back in segment order; the first failure cancels segments not yet started.
+    """
+    items = list(enumerate(segments, 1))
+    workers = max(1, min(concurrency or 1, len(items)))
+    if workers == 1:
+        return [fn(idx, seg) for idx, seg in items]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(fn, idx, seg) for idx, seg in items]
+        try:
+            return [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+
+def _prepare_segments(text, text_type, engine):
+    if text_type == "ssml":
+        # Neural SSML is sanitized up front as before; other engines go through plan_ssml_segment(),
+        # which only removes what the engine would reject. Still split safely if too long
+        if engine == "neural":
+            text = sanitize_ssml_for_neural(text)
+        return split_ssml_safe(text, engine)
+    return split_plain_text(text, engine)
+
+def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE,
+               concurrency=SEGMENT_CONCURRENCY, limiter=None, hedge=HEDGE_REQUESTS, priority="interactive"):
+    """
+    Synthesize `text` to `outpath`. Requests are paced by `limiter`, by default the `priority`
+    class of POLLY_SCHEDULER ("interactive" for single prompts, "bulk" for sweeps).
+    """
+    pc = synthesis_client()
+    segments = _prepare_segments(text, text_type, engine)
+    if limiter is None:
+        limiter = POLLY_SCHEDULER.lane(priority)
 
-        stream = resp.get("AudioStream")
-        if not stream:
-            raise RuntimeError("No AudioStream in response.")
-        audio_bytes += stream.read()
+    def _one(idx, seg):
+        return _synthesize_segment(pc, seg, idx, text_type=text_type, voice=voice, engine=engine,
+                                   output_format=output_format, sample_rate=sample_rate, limiter=limiter,
+                                   hedge=hedge)
 
-    with open(outpath, "wb") as f:
-        f.write(audio_bytes)
+    # Segments are sent concurrently (bounded by `concurrency`) and joined back in original order
+    parts = _map_segments(_one, segments, concurrency)
+    try:
+        with atomic_output(outpath) as out:
+            _write_parts(parts, out, output_format, sample_rate)
+    finally:
+        for part in parts:
+            part.close()
     print(f"Saved: {outpath}")
 
+def _segment_chunks(part, output_format, chunk_size=STREAM_CHUNK_SIZE):
+    # MP3 segments lose their ID3 tag and Xing/LAME frame so the stream is plain audio frames
+    if output_format == "mp3":
+        s = mp3_frames.scan(mp3_frames.read_all(part))
+        if s.first is not None:
+            for start, end in s.runs:
+                part.seek(start)
+                left = end - start
+                while left:
+                    chunk = part.read(min(chunk_size, left))
+                    if not chunk:
+                        return
+                    yield chunk
+                    left -= len(chunk)
+            return
+    part.seek(0)
+    while True:
+        chunk = part.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def synthesize_iter(text, *, text_type, voice, engine, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE,
+                    concurrency=SEGMENT_CONCURRENCY, limiter=None, hedge=HEDGE_REQUESTS,
+                    priority="interactive", chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield the audio for `text` as byte chunks, in order, starting as soon as the first segment
+    arrives while later segments are fetched in the background. At most `concurrency` segments
+    are requested or held ahead of the one being yielded.
+    MP3 comes out as bare frames (no per-segment tags or Xing header, as streaming players
+    expect); PCM and Ogg segments are passed through as they are, since PCM seam smoothing
+    needs the next segment before the current one can end.
+    """
+    pc = synthesis_client()
+    segments = _prepare_segments(text, text_type, engine)
+    if limiter is None:
+        limiter = POLLY_SCHEDULER.lane(priority)
+
+    def _one(idx, seg):
+        return _synthesize_segment(pc, seg, idx, text_type=text_type, voice=voice, engine=engine,
+                                   output_format=output_format, sample_rate=sample_rate, limiter=limiter,
+                                   hedge=hedge)
+
+    ex = ThreadPoolExecutor(max_workers=max(1, min(concurrency or 1, len(segments) or 1)))
+    ahead = deque()
+    items = iter(enumerate(segments, 1))
+    try:
+        for _ in range(max(1, concurrency or 1)):
+            item = next(items, None)
+            if item is not None:
+                ahead.append(ex.submit(_one, *item))
+        while ahead:
+            part = ahead.popleft().result()
+            item = next(items, None)
+            if item is not None:
+                ahead.append(ex.submit(_one, *item))
+            try:
+                yield from _segment_chunks(part, output_format, chunk_size)
+            finally:
+                part.close()
+    finally:
+        # Consumer stopped early or a segment failed: drop what is queued and close what arrived
+        for f in ahead:
+            f.cancel()
+            f.add_done_callback(_discard)
+        ex.shutdown(wait=False)
+
+async def synthesize_aiter(text, **kwargs):
+    """
+    synthesize_iter() as an async iterator, for asyncio servers: each chunk is produced on a
+    worker thread so the event loop is never blocked on Polly.
+        async for chunk in synthesize_aiter(text, text_type="text", voice="Joanna", engine="neural"):
+            await response.write(chunk)
+    """
+    chunks = synthesize_iter(text, **kwargs)
+    worker = ThreadPoolExecutor(max_workers=1)  # the generator is only ever advanced from this thread
+    done = object()
+    pending = None
+    try:
+        while True:
+            pending = worker.submit(next, chunks, done)
+            chunk = await asyncio.wrap_future(pending)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # On cancellation the abandoned next() may still be running; closing the generator under it
+        # would fail with "generator already executing", so let it finish, then close on the same thread
+        cancelled = False
+        if pending is not None:
+            cancelled |= await _wait_thread(pending)
+        cancelled |= await _wait_thread(worker.submit(chunks.close))
+        worker.shutdown(wait=False)
+        if cancelled:
+            raise asyncio.CancelledError()
+
+async def _wait_thread(future):
+    """Wait for a worker-thread future to finish, even through cancellation; True if one arrived."""
+    cancelled = False
+    while not future.done():
+        try:
+            await asyncio.wait([asyncio.wrap_future(future)])
+        except asyncio.CancelledError:
+            cancelled = True
+    return cancelled
+
+class VoiceCatalogue:
+    """
+    Every Polly voice in POLLY_REGION, indexed by voice Id, primary language code and supported engine.
+    """
+    def __init__(self, voices):
+        self.voices = voices
+        self.by_id = {v["Id"]: v for v in voices}
+        self.by_language = {}
+        self.by_engine = {}
+        for v in voices:
+            self.by_language.setdefault(v.get("LanguageCode"), []).append(v)
+            for eng in v.get("SupportedEngines") or []:
+                self.by_engine.setdefault(eng, []).append(v)
+
+    def engines(self, voice_id):
+        return (self.by_id.get(voice_id) or {}).get("SupportedEngines") or []
+
+    def supports(self, voice_id, engine):
+        return engine in self.engines(voice_id)
+
+_VOICE_CATALOGUE = None
+_VOICE_CATALOGUE_LOCK = threading.Lock()
+
+def _load_cached_voices():
+    try:
+        with open(VOICE_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("region") != POLLY_REGION or time.time() - cached.get("fetched_at", 0) > VOICE_CACHE_TTL:
+        return None
+    return cached.get("voices")
+
+def _save_cached_voices(voices):
+    try:
+        ensure_dirs(os.path.dirname(VOICE_CACHE_PATH) or ".")
+        tmp = f"{VOICE_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"region": POLLY_REGION, "fetched_at": time.time(), "voices": voices}, f)
+        os.replace(tmp, VOICE_CACHE_PATH)
+    except OSError as e:
+        print(f"[WARN] Could not cache voice catalogue at {VOICE_CACHE_PATH}: {e}")
+
+def voice_catalogue(refresh=False):
+    """
+    Fetch describe_voices once per process (and once per VOICE_CACHE_TTL on disk).
+    All voice selection and grid planning is answered from this in-memory index.
+    """
+    global _VOICE_CATALOGUE
+    with _VOICE_CATALOGUE_LOCK:
+        if _VOICE_CATALOGUE is None or refresh:
+            voices = None if refresh else _load_cached_voices()
+            if voices is None:
+                voices = []
+                for page in polly_client().get_paginator("describe_voices").paginate():
+                    voices.extend(page.get("Voices", []))
+                _save_cached_voices(voices)
+            _VOICE_CATALOGUE = VoiceCatalogue(voices)
+        return _VOICE_CATALOGUE
+
 def list_voices(language_code=None):
-    pc = polly_client()
-    voices = []
-    paginator = pc.get_paginator("describe_voices")
-    kwargs = {}
+    cat = voice_catalogue()
     if language_code:
-        kwargs["LanguageCode"] = language_code
-    for page in paginator.paginate(**kwargs):
-        voices.extend(page.get("Voices", []))
-    return voices
+        return list(cat.by_language.get(language_code, []))
+    return list(cat.voices)
 
 def select_indian_voice(preferred_engine: str = BASELINE_ENGINE):
     """
@@ -262,25 +1681,24 @@ def select_indian_voice(preferred_engine: str = BASELINE_ENGINE):
     Choose the preferred engine if supported, otherwise fall back to any supported engine.
     """
     try:
-        indian_voices = []
-        # Try Indian English and Hindi voices
-        for lang_code in ("en-IN", "hi-IN"):
-            indian_voices.extend(list_voices(language_code=lang_code))
-        # If API does not filter or returns empty, fall back to all voices
+        cat = voice_catalogue()
+        # Indian English and Hindi voices
+        indian_voices = cat.by_language.get("en-IN", []) + cat.by_language.get("hi-IN", [])
+        # If the region has none, fall back to all voices
         if not indian_voices:
-            indian_voices = list_voices()
+            indian_voices = cat.voices
+        indian_ids = {v.get("Id") for v in indian_voices}
 
         preferred_voice_ids = ["Kajal", "Raveena", "Aditi"]
 
         # Try preferred list first
         for voice_id in preferred_voice_ids:
-            for v in indian_voices:
-                if v.get("Id") == voice_id:
-                    engines = v.get("SupportedEngines") or []
-                    if preferred_engine in engines:
-                        return voice_id, preferred_engine
-                    if engines:
-                        return voice_id, engines[0]
+            if voice_id in indian_ids:
+                engines = cat.engines(voice_id)
+                if preferred_engine in engines:
+                    return voice_id, preferred_engine
+                if engines:
+                    return voice_id, engines[0]
 
         # Otherwise, pick any Indian voice
         for v in indian_voices:
@@ -295,33 +1713,261 @@ def select_indian_voice(preferred_engine: str = BASELINE_ENGINE):
     # Fallback to configured baseline if discovery fails
     return BASELINE_VOICE, BASELINE_ENGINE
 
-def grid_synthesize(text, ssml, *, language_code=GRID_LANGUAGE_CODE, outdir=None):
+class JobLedger:
+    """
+    Append-only JSON-lines record of finished grid jobs; the last line for an output path wins.
+    A resumed sweep skips outputs that still exist with the recorded input hash and byte size.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        lines = 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:  # torn last line from an interrupted run
+                        continue
+                    self._entries[rec.get("output")] = rec
+        except FileNotFoundError:
+            pass
+        if lines > 2 * len(self._entries) + 100:
+            self._compact()
+
+    @staticmethod
+    def input_hash(text, text_type, voice, engine, output_format, sample_rate):
+        return SegmentCache.key(text, text_type, voice, engine, output_format, sample_rate)
+
+    def _compact(self):
+        with atomic_output(self.path) as f:
+            for rec in self._entries.values():
+                f.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def is_done(self, outpath, input_hash):
+        rec = self._entries.get(outpath)
+        if not rec or rec.get("status") != "ok" or rec.get("input_hash") != input_hash:
+            return False
+        try:
+            return os.path.getsize(outpath) == rec.get("bytes")
+        except OSError:
+            return False
+
+    def record(self, outpath, input_hash, status, error=None):
+        rec = {"output": outpath, "input_hash": input_hash, "status": status,
+               "bytes": os.path.getsize(outpath) if status == "ok" else None, "finished_at": time.time()}
+        if error is not None:
+            rec["error"] = str(error)[:500]
+        with self._lock:
+            self._entries[outpath] = rec
+            ensure_dirs(os.path.dirname(self.path) or ".")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def grid_synthesize(text, ssml, *, language_code=GRID_LANGUAGE_CODE, outdir=None,
+                    workers=GRID_WORKERS, tps=GRID_TPS, ledger_path=GRID_LEDGER_PATH):
+    """
+    Synthesize every (voice, engine) combo in both text and SSML variants.
+    Jobs are spread over `workers` threads capped at `tps` requests/second between them, in
+    POLLY_SCHEDULER's "bulk" class so interactive prompts keep priority on the shared quota;
+    a request hit by ThrottlingException slows the rate down and is retried with backoff.
+    Finished jobs are written to the ledger at `ledger_path` (None disables it), so an interrupted
+    sweep resumes with only the failed or changed combos.
+    """
     outdir = outdir or os.path.join(OUTPUT_BASE_DIR, "grid")
     ensure_dirs(outdir)
     voices = list_voices(language_code=language_code) or list_voices()
     combos = [(v["Id"], eng) for v in voices for eng in (v.get("SupportedEngines") or [])]
     print(f"Voices discovered: {len(voices)} | Engine combos: {len(combos)}")
 
+    jobs = []
     for vid, eng in combos:
         voice_dir = os.path.join(outdir, eng, vid)
         ensure_dirs(voice_dir)
+        jobs.append(("text", text, vid, eng, os.path.join(voice_dir, f"text_{vid}_{eng}.{OUTPUT_FORMAT}")))
+        jobs.append(("ssml", ssml, vid, eng, os.path.join(voice_dir, f"ssml_gpt_{vid}_{eng}.{OUTPUT_FORMAT}")))
+
+    ledger = JobLedger(ledger_path) if ledger_path else None
+    # Bulk class of the shared scheduler: single prompts in this process go first; `tps` caps the sweep
+    bucket = POLLY_SCHEDULER.lane("bulk", max_rate=tps)
+
+    def _run(job):
+        kind, body, vid, eng, outpath = job
+        input_hash = JobLedger.input_hash(body, kind, vid, eng, OUTPUT_FORMAT, SAMPLE_RATE)
+        if ledger is not None and ledger.is_done(outpath, input_hash):
+            return "resumed"
         try:
-            synthesize(text, text_type="text", voice=vid, engine=eng,
-                       outpath=os.path.join(voice_dir, f"text_{vid}_{eng}.{OUTPUT_FORMAT}"))
+            # Parallelism comes from the job pool, so each job sends its segments one at a time;
+            # throttling is retried per request inside _call_polly()
+            synthesize(body, text_type=kind, voice=vid, engine=eng, outpath=outpath,
+                       concurrency=1, limiter=bucket, hedge=False)
+            if ledger is not None:
+                ledger.record(outpath, input_hash, "ok")
+            return "ok"
         except Exception as e:
-            print(f"[SKIP text] {vid}/{eng}: {e}")
+            print(f"[SKIP {kind}] {vid}/{eng}: {e}")
+            if ledger is not None:
+                ledger.record(outpath, input_hash, "failed", error=e)
+            return "failed"
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        results = list(ex.map(_run, jobs))
+    elapsed = max(time.monotonic() - started, 1e-9)
+    done, resumed = results.count("ok"), results.count("resumed")
+    print(f"Grid finished: {done} synthesized, {resumed} already done, {results.count('failed')} failed "
+          f"of {len(jobs)} in {elapsed:.1f}s | {done / elapsed:.2f} files/s | "
+          f"{bucket.acquired / elapsed:.2f} requests/s | "
+          f"throttled {bucket.throttled}x, final rate {bucket.rate:.2f} TPS")
+    print("\n".join(run_stats()))
+    if CAPABILITY_STORE is not None:
+        CAPABILITY_STORE.save()
+
+def _s3_key(output_uri, bucket):
+    # OutputUri is https://s3.<region>.amazonaws.com/<bucket>/<key> (or virtual-hosted <bucket>.s3…/<key>)
+    path = urlparse(output_uri).path.lstrip("/")
+    return path[len(bucket) + 1:] if path.startswith(bucket + "/") else path
+
+def _long_form_documents(text, text_type, voice, engine):
+    """(text, text_type, engine) per task: whole documents, split only past the task character caps."""
+    if text_type != "ssml":
+        return [(doc, "text", engine) for doc in split_plain_text(text, engine, limit=LONGFORM_MAX_CHARS)]
+    docs = split_ssml_safe(text, engine, limit=LONGFORM_MAX_CHARS, max_chars=LONGFORM_MAX_REQUEST_CHARS)
+    return [plan_ssml_segment(doc, voice, engine) for doc in docs]
+
+def long_form_synthesize(jobs, *, polly=None, store=None, bucket=LONGFORM_BUCKET, prefix=LONGFORM_PREFIX,
+                         output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE, workers=LONGFORM_DOWNLOAD_WORKERS):
+    """
+    Synthesize whole documents as StartSpeechSynthesisTask jobs instead of split synthesize_speech calls.
+    `jobs` is a list of dicts with text, text_type, voice, engine and outpath. Every task is submitted
+    up front, all of them are polled with per-task exponential backoff, and each finished job's audio is
+    streamed from the object store into its outpath while the rest are still running.
+    `polly` and `store` default to the boto3 Polly and S3 clients; anything with the same methods works,
+    e.g. fake_polly.FakePolly and fake_polly.FakeObjectStore.
+    Returns {outpath: None on success, else the error message}.
+    """
+    if not bucket:
+        raise ValueError("Long-form mode needs an output bucket (set POLLY_LONGFORM_BUCKET or LONGFORM_BUCKET).")
+    pc = polly or polly_client()
+    s3 = store or s3_client()
+    results = {}
+    tasks = []      # [job_index, part_index, task_id, next_poll_at, delay]
+    parts = {}      # job_index -> [s3 key or None per part]
+
+    for j, job in enumerate(jobs):
         try:
-            synthesize(ssml, text_type="ssml", voice=vid, engine=eng,
-                       outpath=os.path.join(voice_dir, f"ssml_gpt_{vid}_{eng}.{OUTPUT_FORMAT}"))
-        except Exception as e:
-            print(f"[SKIP ssml] {vid}/{eng}: {e}")
+            docs = _long_form_documents(job["text"], job["text_type"], job["voice"], job["engine"])
+            if not docs:
+                results[job["outpath"]] = "nothing to synthesize"
+                continue
+            parts[j] = [None] * len(docs)
+            for k, (doc, doc_type, eng) in enumerate(docs):
+                task = pc.start_speech_synthesis_task(
+                    Text=doc, TextType=doc_type, VoiceId=job["voice"], Engine=eng,
+                    OutputFormat=output_format, SampleRate=sample_rate,
+                    OutputS3BucketName=bucket, OutputS3KeyPrefix=prefix,
+                )["SynthesisTask"]
+                tasks.append([j, k, task["TaskId"], time.monotonic() + LONGFORM_POLL_INITIAL, LONGFORM_POLL_INITIAL])
+        except (BotoCoreError, ClientError) as e:
+            results[job["outpath"]] = f"start_speech_synthesis_task failed: {e}"
+            parts.pop(j, None)
+    print(f"Long-form: {len(tasks)} task(s) submitted for {len(jobs)} document(s)")
 
-def main():
-    _assert_aws_creds()
+    def _download(j):
+        outpath = jobs[j]["outpath"]
+        if len(parts[j]) == 1:
+            with atomic_output(outpath) as out:
+                _copy_stream(s3.get_object(Bucket=bucket, Key=parts[j][0])["Body"], out)
+        else:
+            # Several tasks for one document are spooled, then joined like synthesize() segments
+            spooled = []
+            try:
+                for key in parts[j]:
+                    spooled.append(tempfile.TemporaryFile())
+                    _copy_stream(s3.get_object(Bucket=bucket, Key=key)["Body"], spooled[-1])
+                with atomic_output(outpath) as out:
+                    _write_parts(spooled, out, output_format, sample_rate)
+            finally:
+                for part in spooled:
+                    part.close()
+        print(f"Saved: {outpath}")
+
+    downloads = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        while tasks:
+            time.sleep(max(0.0, min(t[3] for t in tasks) - time.monotonic()))
+            now = time.monotonic()
+            for t in [t for t in tasks if t[3] <= now]:
+                j, k, task_id, _, delay = t
+                if j not in parts:  # another part of this job already failed
+                    tasks.remove(t)
+                    continue
+                try:
+                    task = pc.get_speech_synthesis_task(TaskId=task_id)["SynthesisTask"]
+                except (BotoCoreError, ClientError) as e:
+                    if not _is_throttle(e):
+                        results[jobs[j]["outpath"]] = f"get_speech_synthesis_task {task_id} failed: {e}"
+                        parts.pop(j)
+                        tasks.remove(t)
+                        continue
+                    task = {"TaskStatus": "inProgress"}
+                status = task.get("TaskStatus")
+                if status == "completed":
+                    tasks.remove(t)
+                    parts[j][k] = _s3_key(task["OutputUri"], bucket)
+                    if all(parts[j]):
+                        downloads[ex.submit(_download, j)] = j
+                elif status == "failed":
+                    tasks.remove(t)
+                    results[jobs[j]["outpath"]] = f"task {task_id} failed: {task.get('TaskStatusReason')}"
+                    parts.pop(j)
+                else:
+                    # Jittered exponential backoff keeps many pending tasks from polling in lockstep
+                    t[4] = min(delay * 2, LONGFORM_POLL_MAX)
+                    t[3] = now + random.uniform(t[4] / 2, t[4])
+        for fut, j in downloads.items():
+            try:
+                fut.result()
+                results[jobs[j]["outpath"]] = None
+            except (OSError, BotoCoreError, ClientError) as e:
+                results[jobs[j]["outpath"]] = f"download failed: {e}"
+    return results
+
+def synthesize_long_form(text, *, text_type, voice, engine, outpath, **kwargs):
+    """One document through long_form_synthesize(), raising RuntimeError like synthesize() on failure."""
+    error = long_form_synthesize([{"text": text, "text_type": text_type, "voice": voice,
+                                   "engine": engine, "outpath": outpath}], **kwargs)[outpath]
+    if error:
+        raise RuntimeError(f"Long-form synthesis failed for {voice} ({engine}): {error}")
+
+def synthesize_pcm_first(text, *, text_type, voice, engine, outbase, rates=PCM_DERIVED_RATES, **kwargs):
+    """
+    Request PCM from Polly once and derive a WAV for every sample rate in `rates` locally,
+    instead of one billed request per format. Writes f"{outbase}_{rate}.wav" and returns the paths.
+    """
+    import pcm_audio  # numpy is only needed for this mode
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "source.pcm")
+        synthesize(text, text_type=text_type, voice=voice, engine=engine, outpath=raw_path,
+                   output_format="pcm", sample_rate=PCM_SOURCE_RATE, **kwargs)
+        samples = pcm_audio.from_int16(raw_path)
+    paths = []
+    for rate in rates:
+        path = f"{outbase}_{rate}.wav"
+        with atomic_output(path) as out:
+            pcm_audio.write_wav(out, pcm_audio.resample(samples, PCM_SOURCE_RATE, rate), rate)
+        print(f"Saved: {path}")
+        paths.append(path)
+    return paths
+
+def render_baseline(preferred_engine=BASELINE_ENGINE):
+    """Write the baseline recordings (plain text and SSML) for the selected voice; returns their paths."""
     ensure_dirs(os.path.join(OUTPUT_BASE_DIR, "baseline"))
 
     # Select an Indian voice automatically (prefers Kajal, then Raveena, then Aditi)
-    selected_voice, selected_engine = select_indian_voice(preferred_engine=BASELINE_ENGINE)
+    selected_voice, selected_engine = select_indian_voice(preferred_engine=preferred_engine)
     print(f"Using voice: {selected_voice} | Engine: {selected_engine}")
 
     # Baseline: two files (plain + SSML) for the selected voice/engine
@@ -330,19 +1976,53 @@ def main():
                engine=selected_engine, outpath=baseline_text_path)
 
     ssml_engine = "standard" if PRESERVE_RICH_SSML else selected_engine
+    # Long-form mode sends the whole SSML document as one asynchronous task
+    ssml_synthesize = synthesize_long_form if LONGFORM_MODE else synthesize
     try:
         baseline_ssml_path = os.path.join(OUTPUT_BASE_DIR, "baseline", f"ssml_gpt_{selected_voice}_{ssml_engine}.{OUTPUT_FORMAT}")
-        synthesize(SSML_INPUT,  text_type="ssml", voice=selected_voice,
-                   engine=ssml_engine, outpath=baseline_ssml_path)
+        ssml_synthesize(SSML_INPUT,  text_type="ssml", voice=selected_voice,
+                        engine=ssml_engine, outpath=baseline_ssml_path)
     except Exception as e:
         # Fallback: if chosen engine (likely standard) is unsupported, try neural with sanitization
         print(f"[Fallback] SSML synthesis failed with {ssml_engine} for {selected_voice}: {e}. Retrying with neural…")
         ssml_engine = "neural"
         baseline_ssml_path = os.path.join(OUTPUT_BASE_DIR, "baseline", f"ssml_gpt_{selected_voice}_{ssml_engine}.{OUTPUT_FORMAT}")
-        synthesize(SSML_INPUT,  text_type="ssml", voice=selected_voice,
-                   engine=ssml_engine, outpath=baseline_ssml_path)
+        ssml_synthesize(SSML_INPUT,  text_type="ssml", voice=selected_voice,
+                        engine=ssml_engine, outpath=baseline_ssml_path)
 
     print(f"\nBaseline files written:\n  {baseline_text_path}\n  {baseline_ssml_path}\n")
+    paths = [baseline_text_path, baseline_ssml_path]
+    if PCM_FIRST:
+        # One PCM request, every telephony/web sample rate derived locally
+        outbase = os.path.join(OUTPUT_BASE_DIR, "baseline", f"plain_{selected_voice}_{selected_engine}")
+        paths += synthesize_pcm_first(TEXT_INPUT, text_type="text", voice=selected_voice,
+                                      engine=selected_engine, outbase=outbase)
+    return paths
+
+def run_stats():
+    """
+    One line per counter family: segment cache, SSML routes, learned SSML rejections (when any),
+    retries, (when on) hedging and the scheduler.
+    """
+    lines = []
+    if SEGMENT_CACHE is not None:
+        lines.append(f"Segment cache: {SEGMENT_CACHE.stats()}")
+    lines.append(f"SSML routes: {ssml_route_stats()}")
+    learned = CAPABILITY_STORE.hit_counts() if CAPABILITY_STORE is not None else {}
+    if learned:
+        lines.append("Learned rejections (hits): " + ", ".join(f"{name} {n}" for name, n in learned.items()))
+    lines.append(f"Retries: {retry_stats()}")
+    if HEDGE_REQUESTS:
+        lines.append(f"Hedging: {hedge_stats()}")
+    lines.append(f"Scheduler: {POLLY_SCHEDULER.stats()}")
+    return lines
+
+def main():
+    _assert_aws_creds()
+    render_baseline()
+    print("\n".join(run_stats()) + "\n")
+    if CAPABILITY_STORE is not None:
+        CAPABILITY_STORE.save()
 
     if DO_GRID:
         print("Running full grid (this may create MANY files and incur costs)…")
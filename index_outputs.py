@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Index the duration, bitrate and sample rate of every recording under an output tree without
+decoding audio, and generate the README catalogue from that index.
+
+Files are memory-mapped and only headers are read: the Xing/Info/VBRI frame of an MP3 (or its
+frame headers when there is none), the first and last page of an Ogg Vorbis file, the RIFF
+header of a WAV. Unchanged files (same size and mtime) are reused from the previous index,
+and the rest are probed in a process pool.
+
+    python index_outputs.py                              # index OUTPUT_BASE_DIR into <root>/index.json
+    python index_outputs.py out --readme README.md       # ...and regenerate README's catalogue
+"""
+import argparse, json, mmap, os, struct, time, wave
+from concurrent.futures import ProcessPoolExecutor
+
+import generate_copy as gc
+import mp3_frames
+
+INDEX_NAME = "index.json"
+AUDIO_EXTENSIONS = (".mp3", ".ogg", ".wav")
+ENGINE_ORDER = ("neural", "standard", "generative", "long-form")
+VARIANT_ORDER = ("plain", "text", "ssml")
+CATALOGUE_HEADING = "## 📜 Catalogue"
+CATALOGUE_START = "<!-- catalogue:start (generated by index_outputs.py; edits are overwritten) -->"
+CATALOGUE_END = "<!-- catalogue:end -->"
+
+def _probe_mp3(buf):
+    pos, h = mp3_frames.first_frame(buf)
+    if h is None:
+        raise ValueError("no MPEG audio frames")
+    counts = mp3_frames.info_frame_counts(buf, pos, h)
+    if counts and counts[0]:
+        frames, nbytes = counts[0], counts[1] or len(buf) - pos
+    else:
+        s = mp3_frames.scan(buf)  # no Xing header: walk the frame headers
+        frames, nbytes = len(s.frame_sizes), sum(s.frame_sizes)
+    duration = frames * h.samples / h.sample_rate
+    return duration, nbytes * 8 / duration if duration else 0, h.sample_rate
+
+def _probe_ogg(buf):
+    # The first packet is the Vorbis identification header; the last page's granule is the sample count
+    if buf[:4] != b"OggS":
+        raise ValueError("not an Ogg stream")
+    ident = 27 + buf[26]  # page header + segment table
+    if buf[ident:ident + 7] != b"\x01vorbis":
+        raise ValueError("not Ogg Vorbis")
+    rate = struct.unpack_from("<I", buf, ident + 12)[0]
+    last = buf.rfind(b"OggS", max(0, len(buf) - 65307))
+    granule = struct.unpack_from("<q", buf, last + 6)[0]
+    duration = granule / rate
+    return duration, len(buf) * 8 / duration if duration else 0, rate
+
+def _probe_wav(path):
+    with wave.open(path, "rb") as w:
+        rate = w.getframerate()
+        duration = w.getnframes() / rate
+        return duration, rate * w.getsampwidth() * 8 * w.getnchannels(), rate
+
+def probe(path):
+    """{"format", "duration", "bitrate", "sample_rate"} for one file, or {"error": message}."""
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    try:
+        if fmt == "wav":
+            duration, bitrate, rate = _probe_wav(path)
+        else:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                duration, bitrate, rate = (_probe_mp3 if fmt == "mp3" else _probe_ogg)(buf)
+    except (OSError, ValueError, EOFError, struct.error, wave.Error) as e:
+        return {"format": fmt, "error": str(e) or type(e).__name__}
+    return {"format": fmt, "duration": round(duration, 3), "bitrate": int(round(bitrate)), "sample_rate": rate}
+
+def _load_index(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def build_index(root, workers=None):
+    """
+    Bring <root>/index.json up to date and return its {relative path: entry} mapping.
+    Only new or modified files are probed; deleted files drop out.
+    """
+    index_path = os.path.join(root, INDEX_NAME)
+    old = _load_index(index_path)
+    files, todo = {}, []
+    for dirpath, dirnames, names in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(names):
+            if not name.endswith(AUDIO_EXTENSIONS) or name.startswith("."):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            st = os.stat(path)
+            prev = old.get(rel)
+            if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+                files[rel] = prev
+            else:
+                files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                todo.append(rel)
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            paths = [os.path.join(root, rel) for rel in todo]
+            for rel, info in zip(todo, ex.map(probe, paths, chunksize=max(1, len(todo) // 32))):
+                files[rel].update(info)
+    gc.ensure_dirs(root)
+    with gc.atomic_output(index_path) as out:
+        out.write(json.dumps({"version": 1, "files": files}, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    print(f"Indexed {len(files)} file(s) under {root}: {len(todo)} probed, {len(files) - len(todo)} unchanged")
+    return files
+
+def _group_key(group):
+    parts = group.split("/")
+    engine = parts[1] if len(parts) > 1 else ""
+    rank = ENGINE_ORDER.index(engine) if engine in ENGINE_ORDER else len(ENGINE_ORDER)
+    return (parts[0] != "baseline", rank, group)
+
+def _file_key(rel):
+    parent, name = rel.rsplit("/", 1) if "/" in rel else ("", rel)
+    variant = name.split("_", 1)[0]
+    return (parent, VARIANT_ORDER.index(variant) if variant in VARIANT_ORDER else len(VARIANT_ORDER), name)
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes)}:{seconds:04.1f}"
+
+def render_catalogue(files):
+    """Markdown for the README catalogue: one section per baseline/ and grid/<engine>/ folder."""
+    groups = {}
+    for rel in files:
+        parts = rel.split("/")
+        group = "/".join(parts[:2]) if parts[0] == "grid" and len(parts) > 2 else parts[0] if len(parts) > 1 else "."
+        groups.setdefault(group, []).append(rel)
+    lines = []
+    for group in sorted(groups, key=_group_key):
+        lines.append(f"### {group}/")
+        for rel in sorted(groups[group], key=_file_key):
+            info = files[rel]
+            if "error" in info:
+                lines.append(f"- {rel} (unreadable: {info['error']})")
+            else:
+                lines.append(f"- {rel} — {_format_duration(info['duration'])}, "
+                             f"{info['bitrate'] / 1000:.0f} kbps, {info['sample_rate']} Hz")
+        lines.append("")
+    return "\n".join(lines).rstrip("\n")
+
+def update_readme(readme_path, files):
+    """Replace the generated catalogue in README (everything after the catalogue heading the first time)."""
+    with open(readme_path, encoding="utf-8") as f:
+        text = f.read()
+    block = f"{CATALOGUE_START}\n\n{render_catalogue(files)}\n\n{CATALOGUE_END}"
+    if CATALOGUE_START in text and CATALOGUE_END in text:
+        head, rest = text.split(CATALOGUE_START, 1)
+        text = head + block + rest.split(CATALOGUE_END, 1)[1]
+    elif CATALOGUE_HEADING in text:
+        text = text.split(CATALOGUE_HEADING, 1)[0] + f"{CATALOGUE_HEADING}\n\n{block}\n"
+    else:
+        text = text.rstrip("\n") + f"\n\n---\n\n{CATALOGUE_HEADING}\n\n{block}\n"
+    with gc.atomic_output(readme_path) as out:
+        out.write(text.encode("utf-8"))
+    print(f"Catalogue written to {readme_path}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("root", nargs="?", default=gc.OUTPUT_BASE_DIR, help="output tree to index")
+    ap.add_argument("--readme", help="README to regenerate the catalogue section of")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="processes used to probe files")
+    args = ap.parse_args()
+    started = time.monotonic()
+    files = build_index(args.root, workers=max(1, args.workers))
+    if args.readme:
+        update_readme(args.readme, files)
+    print(f"Done in {time.monotonic() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
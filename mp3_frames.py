@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+MPEG Layer III frame parsing for joining Polly MP3 segments without re-encoding.
+
+Each segment is reduced to its audio frames: ID3v2/ID3v1 tags and Xing/Info/LAME/VBRI header
+frames are dropped. The joined stream starts with a single Xing header (Info for constant
+bitrate) holding the exact frame and byte counts and a 100-entry seek TOC, so players report
+the true duration and seek in constant time.
+
+    python mp3_frames.py out_ang/baseline/*.mp3     # print frame/duration summary per file
+"""
+import struct, sys
+from array import array
+from collections import namedtuple
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+# Bitrates (kbps) by bitrate index, Layer III only (the only layer Polly produces)
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2 and 2.5
+}
+_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+_VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+_MONO = 0b11
+
+FrameHeader = namedtuple("FrameHeader", "raw version bitrate sample_rate channel_mode samples length")
+Mp3Scan = namedtuple("Mp3Scan", "runs frame_sizes bitrates first")  # runs: (start, end) byte spans of audio frames
+
+def parse_header(buf, pos=0):
+    """The FrameHeader of a Layer III frame starting at `pos`, or None if there is no valid one."""
+    if pos + 4 > len(buf):
+        return None
+    raw = struct.unpack_from(">I", buf, pos)[0]
+    if raw >> 21 != 0x7FF:
+        return None
+    version = _VERSIONS.get((raw >> 19) & 3)
+    bitrate_idx = (raw >> 12) & 0xF
+    sr_idx = (raw >> 10) & 3
+    if version is None or (raw >> 17) & 3 != 0b01 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+    bitrate = _BITRATES[1 if version == 1 else 2][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][sr_idx]
+    samples = 1152 if version == 1 else 576
+    length = samples // 8 * bitrate // sample_rate + ((raw >> 9) & 1)
+    return FrameHeader(raw, version, bitrate, sample_rate, (raw >> 6) & 3, samples, length)
+
+def _side_info_size(h):
+    if h.version == 1:
+        return 17 if h.channel_mode == _MONO else 32
+    return 9 if h.channel_mode == _MONO else 17
+
+def is_info_frame(buf, pos, h):
+    """True for a Xing/Info (LAME) or VBRI header frame, which carries metadata rather than audio."""
+    crc = 0 if (h.raw >> 16) & 1 else 2
+    tag_at = pos + 4 + crc + _side_info_size(h)
+    return buf[tag_at:tag_at + 4] in (b"Xing", b"Info") or buf[pos + 36:pos + 40] == b"VBRI"
+
+def info_frame_counts(buf, pos, h):
+    """(frames, bytes) recorded in the Xing/Info or VBRI frame at `pos`, either None if absent; None if not one."""
+    crc = 0 if (h.raw >> 16) & 1 else 2
+    tag_at = pos + 4 + crc + _side_info_size(h)
+    if buf[tag_at:tag_at + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", buf, tag_at + 4)[0]
+        at, frames, nbytes = tag_at + 8, None, None
+        if flags & 1:
+            frames = struct.unpack_from(">I", buf, at)[0]
+            at += 4
+        if flags & 2:
+            nbytes = struct.unpack_from(">I", buf, at)[0]
+        return frames, nbytes
+    if buf[pos + 36:pos + 40] == b"VBRI":
+        nbytes, frames = struct.unpack_from(">II", buf, pos + 46)
+        return frames, nbytes
+    return None
+
+def id3v2_size(buf):
+    """Bytes taken by an ID3v2 tag at the start of `buf` (0 if there is none)."""
+    if len(buf) < 10 or buf[:3] != b"ID3":
+        return 0
+    size = 0
+    for b in buf[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    return 10 + size + (10 if buf[5] & 0x10 else 0)
+
+def _resync(buf, pos, end):
+    # Next offset holding a header that is followed by another header (or the end of the data)
+    while True:
+        pos = buf.find(b"\xff", pos, end - 3)
+        if pos < 0:
+            return end
+        h = parse_header(buf, pos)
+        if h and pos + h.length <= end and (pos + h.length == end or parse_header(buf, pos + h.length)):
+            return pos
+        pos += 1
+
+def first_frame(buf):
+    """(offset, FrameHeader) of the first frame after any ID3v2 tag, or (len(buf), None)."""
+    pos = id3v2_size(buf)
+    h = parse_header(buf, pos)
+    if h is None:
+        pos = _resync(buf, pos + 1, len(buf))
+        h = parse_header(buf, pos)
+    return pos, h
+
+def scan(buf):
+    """Locate the audio frames in one MP3 byte buffer, skipping tags, header frames and junk."""
+    start, end = id3v2_size(buf), len(buf)
+    if end - start >= 128 and buf[end - 128:end - 125] == b"TAG":
+        end -= 128
+    runs, sizes, bitrates, first = [], array("I"), set(), None
+    pos = start
+    while pos < end:
+        h = parse_header(buf, pos)
+        if h is None or pos + h.length > end:
+            pos = _resync(buf, pos + 1, end)
+            continue
+        if first is None and is_info_frame(buf, pos, h):
+            pos += h.length
+            continue
+        if first is None:
+            first = h
+        elif (h.version, h.sample_rate, h.channel_mode) != (first.version, first.sample_rate, first.channel_mode):
+            raise ValueError(f"frame at byte {pos} is {h.sample_rate} Hz MPEG-{h.version}, "
+                             f"stream started as {first.sample_rate} Hz MPEG-{first.version}")
+        if runs and runs[-1][1] == pos:
+            runs[-1][1] = pos + h.length
+        else:
+            runs.append([pos, pos + h.length])
+        sizes.append(h.length)
+        bitrates.add(h.bitrate)
+        pos += h.length
+    return Mp3Scan([tuple(r) for r in runs], sizes, bitrates, first)
+
+def xing_frame(template, frames, total_bytes, toc, cbr=False):
+    """
+    One header-only frame shaped like `template` carrying a Xing/Info tag with frame count,
+    byte count (including this frame) and a 100-entry TOC.
+    """
+    payload = (b"Info" if cbr else b"Xing") + struct.pack(">III", 0x7, frames, total_bytes) + bytes(toc)
+    needed = 4 + _side_info_size(template) + len(payload)
+    table = _BITRATES[1 if template.version == 1 else 2]
+    for bitrate_idx in range(1, 15):
+        # Same version/rate/channels as the audio; smallest bitrate that fits, padding off, no CRC
+        raw = (template.raw & ~(0xF << 12) & ~(1 << 9)) | (bitrate_idx << 12) | (1 << 16)
+        length = template.samples // 8 * table[bitrate_idx] * 1000 // template.sample_rate
+        if length >= needed:
+            frame = bytearray(length)
+            struct.pack_into(">I", frame, 0, raw)
+            frame[4 + _side_info_size(template):needed] = payload
+            return bytes(frame)
+    raise ValueError("no bitrate leaves room for a Xing header")
+
+def _xing_length(template):
+    return len(xing_frame(template, 0, 0, bytes(100)))
+
+def read_all(f):
+    """The whole content of a seekable file, read from the start."""
+    f.seek(0)
+    return f.read()
+
+def join_mp3(parts, out):
+    """
+    Write the audio frames of every seekable file in `parts`, in order, to `out` behind one
+    Xing/Info header. Nothing is re-encoded. Returns (frames, duration_seconds).
+    Raises ValueError if the parts disagree on sample rate, MPEG version or channel mode.
+    """
+    scans, first = [], None
+    sizes, bitrates = array("I"), set()
+    for f in parts:
+        s = scan(read_all(f))
+        if s.first is not None:
+            if first is None:
+                first = s.first
+            elif (s.first.version, s.first.sample_rate, s.first.channel_mode) != \
+                    (first.version, first.sample_rate, first.channel_mode):
+                raise ValueError(f"segments differ: {s.first.sample_rate} Hz vs {first.sample_rate} Hz")
+        scans.append(s)
+        sizes.extend(s.frame_sizes)
+        bitrates |= s.bitrates
+    if first is None:
+        return 0, 0.0
+
+    # Seek TOC: byte position (in 1/256ths of the file) at each percent of the duration
+    head = _xing_length(first)
+    total = head + sum(sizes)
+    offsets, at = array("Q"), head
+    for n in sizes:
+        offsets.append(at)
+        at += n
+    toc = [min(255, offsets[len(sizes) * i // 100] * 256 // total) for i in range(100)]
+    out.write(xing_frame(first, len(sizes), total, toc, cbr=len(bitrates) == 1))
+
+    for f, s in zip(parts, scans):
+        for start, end in s.runs:
+            f.seek(start)
+            left = end - start
+            while left:
+                chunk = f.read(min(COPY_CHUNK_SIZE, left))
+                if not chunk:
+                    raise ValueError("segment shrank while it was being joined")
+                out.write(chunk)
+                left -= len(chunk)
+    return len(sizes), len(sizes) * first.samples / first.sample_rate
+
+def main(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            s = scan(f.read())
+        if s.first is None:
+            print(f"{path}: no MPEG audio frames")
+            continue
+        seconds = len(s.frame_sizes) * s.first.samples / s.first.sample_rate
+        print(f"{path}: {len(s.frame_sizes)} frames, {seconds:.2f}s, {s.first.sample_rate} Hz "
+              f"MPEG-{s.first.version}, {len(s.runs)} run(s)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
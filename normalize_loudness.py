@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# pip install numpy
+"""
+Measure and normalise the loudness of PCM/WAV output from grid_synthesize(), so voices and
+engines in the catalogue are compared at the same level.
+
+Integrated loudness follows ITU-R BS.1770: K-weighting (applied by FFT block convolution),
+400 ms gating blocks with 75% overlap, an absolute gate at -70 LUFS and a relative gate 10 LU
+below. Files are spread over a process pool. MP3/OGG cannot be decoded here and are skipped;
+synthesize with OUTPUT_FORMAT = "pcm" (or PCM_FIRST) to include them.
+
+    python normalize_loudness.py                      # every out*/grid tree -> out*/grid_loudnorm
+    python normalize_loudness.py out_ang/grid --in-place --target -16
+    python normalize_loudness.py --measure-only
+"""
+import argparse, glob, os, time, wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import generate_copy as gc
+import pcm_audio
+
+TARGET_LUFS     = -16.0   # spoken-word loudness for web/podcast playback
+PEAK_CEILING_DB = -1.0    # gain is reduced if the normalised sample peak would exceed this (dBFS)
+PCM_RATE        = 16000   # sample rate assumed for raw .pcm files
+AUDIO_EXTENSIONS = (".wav", ".pcm")
+
+BLOCK_SECONDS   = 0.4
+BLOCK_OVERLAP   = 0.75
+ABSOLUTE_GATE   = -70.0
+RELATIVE_GATE   = -10.0
+FFT_BLOCK       = 1 << 16
+
+def _biquad_response(b, a, w):
+    z = np.exp(-1j * w)
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+def _k_weighting(rate):
+    """BS.1770 pre-filter (high shelf) and RLB high-pass as biquad coefficients for `rate`."""
+    # High shelf: +4 dB above ~1.5 kHz
+    A, w0 = 10 ** (4.0 / 40), 2 * np.pi * 1500.0 / rate
+    alpha, cw = np.sin(w0) / (2 * (1 / np.sqrt(2))), np.cos(w0)
+    shelf = ((A * ((A + 1) + (A - 1) * cw + 2 * np.sqrt(A) * alpha),
+              -2 * A * ((A - 1) + (A + 1) * cw),
+              A * ((A + 1) + (A - 1) * cw - 2 * np.sqrt(A) * alpha)),
+             ((A + 1) - (A - 1) * cw + 2 * np.sqrt(A) * alpha,
+              2 * ((A - 1) - (A + 1) * cw),
+              (A + 1) - (A - 1) * cw - 2 * np.sqrt(A) * alpha))
+    # High-pass at 38 Hz
+    w0 = 2 * np.pi * 38.0 / rate
+    alpha, cw = np.sin(w0) / (2 * 0.5), np.cos(w0)
+    highpass = (((1 + cw) / 2, -(1 + cw), (1 + cw) / 2), (1 + alpha, -2 * cw, 1 - alpha))
+    return shelf, highpass
+
+_K_IMPULSE = {}
+
+def k_weighting_impulse(rate, seconds=0.5):
+    """The K-weighting cascade as an FIR impulse response, long enough for its tail to die out."""
+    if rate not in _K_IMPULSE:
+        n = 1 << 18
+        w = 2 * np.pi * np.fft.rfftfreq(n)
+        response = np.ones_like(w, dtype=complex)
+        for b, a in _k_weighting(rate):
+            response *= _biquad_response(b, a, w)
+        _K_IMPULSE[rate] = np.fft.irfft(response, n)[:int(rate * seconds)]
+    return _K_IMPULSE[rate]
+
+def k_weight(x, rate, block=FFT_BLOCK):
+    """Apply K-weighting with overlap-add FFT convolution, one block at a time."""
+    h = k_weighting_impulse(rate)
+    step = block - len(h) + 1
+    H = np.fft.rfft(h, block)
+    y = np.zeros(len(x) + len(h) - 1)
+    for start in range(0, len(x), step):
+        seg = np.fft.irfft(np.fft.rfft(x[start:start + step], block) * H, block)
+        end = min(start + block, len(y))
+        y[start:end] += seg[:end - start]
+    return y[:len(x)]
+
+def integrated_loudness(x, rate):
+    """BS.1770 integrated loudness of mono float samples in LUFS, or None if under one block long."""
+    size, hop = int(BLOCK_SECONDS * rate), int(BLOCK_SECONDS * (1 - BLOCK_OVERLAP) * rate)
+    if len(x) < size:
+        return None
+    energy = np.concatenate(([0.0], np.cumsum(np.square(k_weight(x.astype(np.float64), rate)))))
+    starts = np.arange(0, len(x) - size + 1, hop)
+    z = (energy[starts + size] - energy[starts]) / size
+    loudness = -0.691 + 10 * np.log10(z + 1e-20)
+    z = z[loudness > ABSOLUTE_GATE]
+    if not z.size:
+        return None
+    relative = -0.691 + 10 * np.log10(z.mean()) + RELATIVE_GATE
+    z = z[-0.691 + 10 * np.log10(z) > relative]
+    return float(-0.691 + 10 * np.log10(z.mean()))
+
+def _read(path, pcm_rate):
+    if path.endswith(".wav"):
+        return pcm_audio.read_wav(path)
+    return pcm_audio.from_int16(path), pcm_rate
+
+def _write(path, x, rate):
+    with gc.atomic_output(path) as out:
+        if path.endswith(".wav"):
+            pcm_audio.write_wav(out, x, rate)
+        else:
+            out.write(pcm_audio.to_int16(x).tobytes())
+
+def normalize_file(job):
+    """Measure one file and, unless `outpath` is None, write it at the target loudness."""
+    path, outpath, target, ceiling, pcm_rate = job
+    try:
+        x, rate = _read(path, pcm_rate)
+        before = integrated_loudness(x, rate)
+        if before is None:
+            return path, None, None, "too short or silent"
+        gain_db = target - before
+        peak = float(np.max(np.abs(x))) if len(x) else 0.0
+        if peak > 0:
+            gain_db = min(gain_db, ceiling - 20 * np.log10(peak))
+        if outpath is not None:
+            _write(outpath, x * (10 ** (gain_db / 20)), rate)
+        return path, before, gain_db, None
+    except (OSError, ValueError, EOFError, wave.Error) as e:
+        return path, None, None, str(e)
+
+def find_audio(roots):
+    for root in roots:
+        for dirpath, _, files in os.walk(root):
+            for name in sorted(files):
+                if name.endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(dirpath, name)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("roots", nargs="*", help="grid trees to process (default: every out*/grid)")
+    ap.add_argument("--target", type=float, default=TARGET_LUFS, help="integrated loudness to normalise to (LUFS)")
+    ap.add_argument("--peak", type=float, default=PEAK_CEILING_DB, help="sample-peak ceiling after gain (dBFS)")
+    ap.add_argument("--pcm-rate", type=int, default=PCM_RATE, help="sample rate of raw .pcm files")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="processes in the pool")
+    ap.add_argument("--in-place", action="store_true", help="overwrite files instead of writing <root>_loudnorm")
+    ap.add_argument("--measure-only", action="store_true", help="report loudness without writing anything")
+    args = ap.parse_args()
+
+    roots = args.roots or sorted(glob.glob("out*/grid"))
+    jobs = []
+    for root in roots:
+        root = root.rstrip("/\\")
+        for path in find_audio([root]):
+            if args.measure_only:
+                outpath = None
+            elif args.in_place:
+                outpath = path
+            else:
+                outpath = os.path.join(f"{root}_loudnorm", os.path.relpath(path, root))
+                gc.ensure_dirs(os.path.dirname(outpath))
+            jobs.append((path, outpath, args.target, args.peak, args.pcm_rate))
+    if not jobs:
+        print(f"No {'/'.join(AUDIO_EXTENSIONS)} files under: {', '.join(roots) or '(no out*/grid trees)'}")
+        return
+
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        results = list(ex.map(normalize_file, jobs, chunksize=max(1, len(jobs) // (4 * max(1, args.workers)))))
+    elapsed = time.monotonic() - started
+
+    failed = 0
+    for path, before, gain_db, error in results:
+        if error:
+            failed += 1
+            print(f"[SKIP] {path}: {error}")
+        else:
+            print(f"{before:7.1f} LUFS  {gain_db:+6.1f} dB  {path}")
+    done = "measured" if args.measure_only else f"normalised to {args.target:.1f} LUFS"
+    print(f"\n{len(results) - failed} {done}, {failed} skipped, in {elapsed:.1f}s with {args.workers} worker(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# pip install numpy
+"""
+NumPy helpers for Polly PCM output (16-bit signed little-endian mono).
+
+Polly returns PCM only at 8000 or 16000 Hz. Other rates are derived here with a windowed-sinc
+polyphase resampler; 22050 Hz is interpolated from 16 kHz, so it adds no bandwidth.
+smooth_joins() trims the silence around each synthesized segment to a fixed gap and crossfades
+the seams, streaming one segment at a time.
+
+    python pcm_audio.py speech.pcm --rate 16000 --to 8000 16000 22050   # writes speech_<rate>.wav
+"""
+import argparse, os, wave
+from math import gcd
+
+import numpy as np
+
+RESAMPLE_TAPS  = 32        # filter taps per output sample at the source rate (more when downsampling)
+RESAMPLE_BLOCK = 1 << 15   # output samples computed per vectorised block
+SILENCE_FRAME_MS = 10      # energy is measured over frames of this length
+SILENCE_THRESHOLD_DB = -45.0  # frames quieter than this (dBFS RMS) count as silence
+SEAM_GAP_MS    = 250       # silence left at each join, half from either side
+CROSSFADE_MS   = 10        # linear crossfade across each join
+
+def from_int16(raw) -> np.ndarray:
+    """Little-endian 16-bit PCM bytes (or a .pcm path) as float32 samples in [-1, 1)."""
+    if isinstance(raw, (str, os.PathLike)):
+        pcm = np.fromfile(raw, dtype="<i2")
+    else:
+        pcm = np.frombuffer(raw, dtype="<i2")
+    return pcm.astype(np.float32) / 32768.0
+
+def to_int16(x: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(x * 32768.0), -32768, 32767).astype("<i2")
+
+def _polyphase_table(up, cutoff, width):
+    # Row p holds the taps for an output sample p/up of the way between two input samples
+    offsets = np.arange(-width + 1, width + 1)
+    d = np.arange(up)[:, None] / up - offsets[None, :]
+    window = 0.5 * (1.0 + np.cos(np.pi * np.clip(d / width, -1.0, 1.0)))
+    return offsets, (cutoff * np.sinc(cutoff * d) * window).astype(np.float32)
+
+def resample(x: np.ndarray, src_rate: int, dst_rate: int, taps=RESAMPLE_TAPS, block=RESAMPLE_BLOCK) -> np.ndarray:
+    """
+    Band-limited resampling of float samples from `src_rate` to `dst_rate`. The filter is
+    precomputed per phase of the rational rate ratio and applied block by block, so memory
+    stays bounded and there is no per-sample Python loop however long the audio is.
+    """
+    src_rate, dst_rate = int(src_rate), int(dst_rate)
+    if src_rate == dst_rate:
+        return x.astype(np.float32, copy=True)
+    g = gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+    cutoff = min(1.0, up / down)  # low-pass below the new Nyquist when downsampling
+    width = int(np.ceil(taps / 2 / cutoff))
+    offsets, table = _polyphase_table(up, cutoff, width)
+    padded = np.pad(x.astype(np.float32, copy=False), (width, width + 1))
+    n_out = len(x) * up // down
+    out = np.empty(n_out, dtype=np.float32)
+    for start in range(0, n_out, block):
+        pos = np.arange(start, min(start + block, n_out), dtype=np.int64) * down
+        base, phase = np.divmod(pos, up)
+        gathered = padded[base[:, None] + offsets[None, :] + width]
+        out[start:start + len(pos)] = np.einsum("ij,ij->i", gathered, table[phase])
+    return out
+
+def speech_bounds(x: np.ndarray, rate: int, threshold_db=SILENCE_THRESHOLD_DB, frame_ms=SILENCE_FRAME_MS):
+    """
+    (start, end) sample offsets spanning every frame louder than `threshold_db`.
+    An all-silent signal returns an empty span at its midpoint.
+    """
+    n = max(1, int(rate * frame_ms / 1000))
+    frames = len(x) // n
+    if frames == 0:
+        return 0, len(x)
+    power = np.square(x[:frames * n].reshape(frames, n), dtype=np.float64).mean(axis=1)
+    loud = np.flatnonzero(10.0 * np.log10(power + 1e-12) > threshold_db)
+    if not loud.size:
+        return len(x) // 2, len(x) // 2
+    end = len(x) if loud[-1] == frames - 1 else (loud[-1] + 1) * n
+    return int(loud[0]) * n, end
+
+def smooth_joins(segments, rate: int, gap_ms=SEAM_GAP_MS, crossfade_ms=CROSSFADE_MS,
+                 threshold_db=SILENCE_THRESHOLD_DB):
+    """
+    Yield float32 chunks of `segments` (an iterable of sample arrays) joined end to end.
+    At every join the trailing and leading silence is cut to gap_ms/2 per side and the two
+    sides are crossfaded over crossfade_ms; the very start and end are left as they are.
+    Only one segment is held in memory at a time.
+    """
+    keep = int(rate * gap_ms / 2000)
+    fade = int(rate * crossfade_ms / 1000)
+    items = iter(segments)
+    cur, held, first = next(items, None), None, True
+    while cur is not None:
+        nxt = next(items, None)
+        lo, hi = speech_bounds(cur, rate, threshold_db)
+        piece = cur[0 if first else max(0, lo - keep):len(cur) if nxt is None else min(len(cur), hi + keep)]
+        if held is not None:
+            n = min(len(held), len(piece))
+            ramp = (np.arange(n, dtype=np.float32) + 0.5) / max(n, 1)
+            mixed = held[len(held) - n:] * (1.0 - ramp) + piece[:n] * ramp
+            yield held[:len(held) - n]
+            yield mixed
+            piece = piece[n:]
+        if nxt is not None:
+            held = piece[max(0, len(piece) - fade):]
+            yield piece[:len(piece) - len(held)]
+        else:
+            yield piece
+        cur, first = nxt, False
+
+def write_wav(f, x: np.ndarray, rate: int):
+    """Write float samples to the open binary file `f` as a 16-bit mono WAV."""
+    w = wave.open(f, "wb")
+    w.setnchannels(1)
+    w.setsampwidth(2)
+    w.setframerate(int(rate))
+    w.writeframes(to_int16(x).tobytes())
+    w.close()
+
+def read_wav(path):
+    """(float32 samples averaged to mono, sample rate) from a 16-bit PCM WAV."""
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit WAV is supported")
+        channels, rate = w.getnchannels(), w.getframerate()
+        x = from_int16(w.readframes(w.getnframes()))
+    if channels > 1:
+        x = x.reshape(-1, channels).mean(axis=1)
+    return x, rate
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pcm", help="raw 16-bit little-endian mono PCM from Polly")
+    ap.add_argument("--rate", type=int, default=16000, help="sample rate the PCM was requested at")
+    ap.add_argument("--to", type=int, nargs="+", default=[8000, 16000, 22050], help="WAV sample rates to write")
+    args = ap.parse_args()
+    x = from_int16(args.pcm)
+    stem = os.path.splitext(args.pcm)[0]
+    for rate in args.to:
+        with open(f"{stem}_{rate}.wav", "wb") as f:
+            write_wav(f, resample(x, args.rate, rate), rate)
+        print(f"Saved: {stem}_{rate}.wav")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# pip install boto3   (the server only; the client commands use the standard library)
+"""
+Long-lived synthesis service around generate_copy.py, plus the client that talks to it.
+
+The server pays once for importing boto3, resolving credentials, loading the voice catalogue
+and the segment cache index, and opening TLS connections; every request after that reuses
+them. Requests are served concurrently and share the process-wide Polly limits.
+
+    python polly_daemon.py serve                            # http://127.0.0.1:8765
+    python polly_daemon.py serve --socket /tmp/polly.sock   # Unix socket instead of TCP
+    python polly_daemon.py baseline                         # what `python generate_copy.py` writes
+    python polly_daemon.py say "Press 1 for sales." -o menu.mp3 --voice Joanna --engine neural
+    python polly_daemon.py say "<speak>Hold on.</speak>" --ssml -o hold.mp3
+    python polly_daemon.py voices --language en-IN
+    python polly_daemon.py stats
+
+Client commands find the server through --socket / --url, or POLLY_DAEMON_SOCKET / POLLY_DAEMON_URL.
+
+HTTP API (JSON unless noted):
+    GET  /health                  uptime and request count
+    GET  /voices?language=en-US   voice catalogue entries
+    GET  /stats                   segment cache, SSML route, retry, hedging and scheduler counters
+                                  (queue depth and wait time per priority class)
+    POST /synthesize              {"text" | "ssml", "voice", "engine", "format", "sample_rate", "outpath",
+                                   "priority": "interactive" (default) or "bulk"}
+                                  with outpath (inside OUTPUT_BASE_DIR, relative paths start there):
+                                  written on the server, JSON reply; without: the audio is streamed
+                                  back (chunked) as soon as the first segment is ready
+    POST /baseline                render the baseline recordings into OUTPUT_BASE_DIR, reply with their paths
+"""
+import argparse, http.client, json, os, signal, socket, socketserver, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_URL = os.environ.get("POLLY_DAEMON_URL", f"http://{DAEMON_HOST}:{DAEMON_PORT}")
+DAEMON_SOCKET = os.environ.get("POLLY_DAEMON_SOCKET")  # a Unix socket path takes precedence over the URL
+MAX_BODY_BYTES = 8 * 1024 * 1024
+CONTENT_TYPES = {"mp3": "audio/mpeg", "ogg_vorbis": "audio/ogg", "pcm": "audio/L16"}
+
+# ================== SERVER ==================
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, and chunked streaming of audio
+    gc = None                      # generate_copy, imported by serve()
+
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _count_request(self):
+        with self.server.lock:
+            self.server.requests += 1
+
+    def _json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            # The body is left unread, so the connection cannot carry another request
+            self.close_connection = True
+            raise ValueError(f"request body over {MAX_BODY_BYTES} bytes" if length > 0 else "invalid Content-Length")
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("request body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        gc = self.gc
+        url = urlparse(self.path)
+        self._count_request()
+        if url.path == "/health":
+            self._json(200, {"ok": True, "uptime": round(time.monotonic() - self.server.started, 1),
+                             "requests": self.server.requests, "backend": gc.POLLY_BACKEND})
+        elif url.path == "/voices":
+            language = parse_qs(url.query).get("language", [None])[0]
+            try:
+                voices = gc.list_voices(language)
+            except Exception as e:
+                self._json(502, {"error": str(e)})
+                return
+            self._json(200, {"voices": [{"id": v["Id"], "language": v.get("LanguageCode"),
+                                         "gender": v.get("Gender"), "engines": v.get("SupportedEngines") or []}
+                                        for v in voices]})
+        elif url.path == "/stats":
+            self._json(200, {"stats": gc.run_stats()})
+        else:
+            self._json(404, {"error": f"no such endpoint: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self._count_request()
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._json(400, {"error": str(e)})
+            return
+        if url.path == "/synthesize":
+            self._synthesize(payload)
+        elif url.path == "/baseline":
+            try:
+                paths = self.gc.render_baseline(payload.get("engine") or self.gc.BASELINE_ENGINE)
+            except Exception as e:
+                self._json(502, {"error": str(e)})
+                return
+            self._json(200, {"paths": paths})
+        else:
+            self._json(404, {"error": f"no such endpoint: {url.path}"})
+
+    def _synthesize(self, payload):
+        gc = self.gc
+        if ("text" in payload) == ("ssml" in payload):
+            self._json(400, {"error": "exactly one of text or ssml is required"})
+            return
+        text_type = "ssml" if "ssml" in payload else "text"
+        output_format = payload.get("format", gc.OUTPUT_FORMAT)
+        if output_format not in CONTENT_TYPES:
+            self._json(400, {"error": f"unsupported format {output_format!r}"})
+            return
+        engine = payload.get("engine") or gc.BASELINE_ENGINE
+        voice = payload.get("voice")
+        if not voice:
+            voice, engine = gc.select_indian_voice(preferred_engine=engine)
+        default_rate = gc.PCM_SOURCE_RATE if output_format == "pcm" else gc.SAMPLE_RATE
+        priority = payload.get("priority", "interactive")
+        if priority not in gc.PRIORITY_WEIGHTS:
+            self._json(400, {"error": f"unknown priority {priority!r}"})
+            return
+        job = dict(text_type=text_type, voice=voice, engine=engine, output_format=output_format,
+                   sample_rate=str(payload.get("sample_rate") or default_rate), priority=priority)
+        started = time.monotonic()
+
+        if payload.get("outpath"):
+            outpath = _confined_outpath(gc, payload["outpath"])
+            if outpath is None:
+                self._json(403, {"error": f"outpath must be inside {os.path.realpath(gc.OUTPUT_BASE_DIR)}"})
+                return
+            try:
+                gc.ensure_dirs(os.path.dirname(outpath))
+                gc.synthesize(payload[text_type], outpath=outpath, **job)
+            except Exception as e:
+                self._json(502, {"error": str(e)})
+                return
+            self._json(200, {"outpath": outpath, "voice": voice, "engine": engine,
+                             "seconds": round(time.monotonic() - started, 3)})
+            return
+
+        # Fetch the first chunk before committing to a 200, so early failures get a proper error
+        chunks = gc.synthesize_iter(payload[text_type], **job)
+        try:
+            first = next(chunks, b"")
+        except Exception as e:
+            self._json(502, {"error": str(e)})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[output_format])
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Polly-Voice", voice)
+        self.send_header("X-Polly-Engine", engine)
+        self.end_headers()
+        try:
+            for chunk in _prepend(first, chunks):
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            # Mid-stream failure: the status is already sent, so drop the connection to signal it
+            self.log_error("synthesis aborted mid-stream: %s", e)
+            self.close_connection = True
+        finally:
+            chunks.close()
+
+def _confined_outpath(gc, outpath):
+    """
+    `outpath` resolved (symlinks included) under OUTPUT_BASE_DIR, where relative paths start,
+    or None if it points anywhere else: the daemon never writes outside its output folder.
+    """
+    base = os.path.realpath(gc.OUTPUT_BASE_DIR)
+    path = os.path.realpath(os.path.join(base, outpath))
+    return path if path != base and os.path.commonpath([base, path]) == base else None
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):  # stale socket from a previous run
+            os.unlink(self.server_address)
+        super().server_bind()
+        os.chmod(self.server_address, 0o600)
+        self.server_name, self.server_port = "localhost", 0
+
+def warm_up(gc):
+    """Build everything a first request would otherwise pay for."""
+    gc._assert_aws_creds()
+    print(f"Voice catalogue: {len(gc.voice_catalogue().voices)} voices")
+    if gc.SEGMENT_CACHE is not None:
+        gc.SEGMENT_CACHE.warm()
+        print(f"Segment cache: {gc.SEGMENT_CACHE.stats()}")
+    try:
+        # Opens a pooled TLS connection on the client synthesize_speech uses
+        gc.synthesis_client().describe_voices(LanguageCode=gc.GRID_LANGUAGE_CODE or "en-US")
+    except Exception as e:
+        print(f"[WARN] Warm-up request failed: {e}")
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(host=DAEMON_HOST, port=DAEMON_PORT, socket_path=None):
+    import generate_copy as gc
+    warm_up(gc)
+    _Handler.gc = gc
+    if socket_path:
+        server = _UnixHTTPServer(socket_path, _Handler)
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        where = f"http://{host}:{server.server_address[1]}"
+    server.started, server.requests, server.lock = time.monotonic(), 0, threading.Lock()
+    signal.signal(signal.SIGTERM, _stop)  # service managers stop daemons with SIGTERM
+    print(f"Serving Polly synthesis on {where} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        if gc.CAPABILITY_STORE is not None:
+            gc.CAPABILITY_STORE.save()
+        print("\n".join(gc.run_stats()))
+
+# ================== CLIENT ==================
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def _connect(args, timeout=600):
+    if args.socket:
+        return _UnixHTTPConnection(args.socket, timeout=timeout)
+    url = urlparse(args.url)
+    return http.client.HTTPConnection(url.hostname or DAEMON_HOST, url.port or DAEMON_PORT, timeout=timeout)
+
+def _request(args, method, path, payload=None):
+    conn = _connect(args)
+    body = None if payload is None else json.dumps(payload).encode("utf-8")
+    headers = {} if body is None else {"Content-Type": "application/json"}
+    try:
+        conn.request(method, path, body=body, headers=headers)
+    except OSError as e:
+        sys.exit(f"Cannot reach the daemon at {args.socket or args.url}: {e} (start it with `polly_daemon.py serve`)")
+    return conn, conn.getresponse()
+
+def _json_reply(resp):
+    reply = json.loads(resp.read() or b"{}")
+    if resp.status != 200:
+        sys.exit(f"[{resp.status}] {reply.get('error', resp.reason)}")
+    return reply
+
+def cmd_say(args):
+    payload = {"ssml" if args.ssml else "text": args.text, "format": args.format}
+    for key in ("voice", "engine", "sample_rate", "priority"):
+        if getattr(args, key):
+            payload[key] = getattr(args, key)
+    if args.server_side:
+        payload["outpath"] = os.path.abspath(args.output)
+    started = time.monotonic()
+    conn, resp = _request(args, "POST", "/synthesize", payload)
+    try:
+        if args.server_side or resp.status != 200:
+            reply = _json_reply(resp)
+            print(f"Saved: {reply['outpath']} ({reply['voice']}/{reply['engine']}, {reply['seconds']:.2f}s)")
+            return
+        tmp = f"{args.output}.part"
+        first = None
+        try:
+            with open(tmp, "wb") as out:
+                while True:
+                    chunk = resp.read1(64 * 1024)
+                    if not chunk:
+                        break
+                    first = first or time.monotonic() - started
+                    out.write(chunk)
+            os.replace(tmp, args.output)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        print(f"Saved: {args.output} ({resp.getheader('X-Polly-Voice')}/{resp.getheader('X-Polly-Engine')}, "
+              f"first audio {first or 0:.2f}s, total {time.monotonic() - started:.2f}s)")
+    except http.client.IncompleteRead as e:
+        sys.exit(f"Synthesis failed mid-stream: {e}")
+    finally:
+        conn.close()
+
+def cmd_baseline(args):
+    conn, resp = _request(args, "POST", "/baseline", {"engine": args.engine} if args.engine else {})
+    reply = _json_reply(resp)
+    conn.close()
+    print("Baseline files written:\n  " + "\n  ".join(reply["paths"]))
+
+def cmd_voices(args):
+    path = f"/voices?language={args.language}" if args.language else "/voices"
+    conn, resp = _request(args, "GET", path)
+    reply = _json_reply(resp)
+    conn.close()
+    for v in reply["voices"]:
+        print(f"{v['id']:<12} {v['language'] or '':<8} {v['gender'] or '':<7} {', '.join(v['engines'])}")
+
+def cmd_stats(args):
+    for path in ("/health", "/stats"):
+        conn, resp = _request(args, "GET", path)
+        reply = _json_reply(resp)
+        conn.close()
+        if "stats" in reply:
+            print("\n".join(reply["stats"]))
+        else:
+            print(f"Up {reply['uptime']}s, {reply['requests']} request(s), backend {reply['backend']}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--socket", default=DAEMON_SOCKET, help="Unix socket path (instead of TCP)")
+    ap.add_argument("--url", default=DAEMON_URL, help="daemon address for TCP")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve", help="run the daemon")
+    p.add_argument("--host", default=DAEMON_HOST)
+    p.add_argument("--port", type=int, default=DAEMON_PORT)
+    p.set_defaults(func=lambda a: serve(a.host, a.port, a.socket))
+    p = sub.add_parser("say", help="synthesize one prompt")
+    p.add_argument("text")
+    p.add_argument("-o", "--output", required=True, help="audio file to write")
+    p.add_argument("--ssml", action="store_true", help="text is SSML")
+    p.add_argument("--voice", help="default: the daemon's voice selection")
+    p.add_argument("--engine")
+    p.add_argument("--format", default="mp3", choices=sorted(CONTENT_TYPES))
+    p.add_argument("--sample-rate")
+    p.add_argument("--priority", choices=("interactive", "bulk"), help="scheduling class (default: interactive)")
+    p.add_argument("--server-side", action="store_true",
+                   help="have the daemon write --output itself (must be inside its output folder)")
+    p.set_defaults(func=cmd_say)
+    p = sub.add_parser("baseline", help="render the baseline recordings")
+    p.add_argument("--engine")
+    p.set_defaults(func=cmd_baseline)
+    p = sub.add_parser("voices", help="list voices")
+    p.add_argument("--language")
+    p.set_defaults(func=cmd_voices)
+    p = sub.add_parser("stats", help="daemon health and counters")
+    p.set_defaults(func=cmd_stats)
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
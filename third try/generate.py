@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 # pip install boto3
-import os, re
+import os, re, json, shutil, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
 # ================== CONFIG (edit these) ==================
@@ -17,6 +20,11 @@ SAMPLE_RATE      = "24000"
 GRID_LANGUAGE_CODE = "en-US"        # None for all languages
 DO_GRID            = False          # try all voice/engine combos
 OUTPUT_BASE_DIR    = "out_vm"       # base folder for all recordings
+SEGMENT_CONCURRENCY = 4             # parallel synthesize_speech calls per script (1 = sequential)
+POLLY_MAX_POOL     = 32             # keep-alive HTTP connections in the shared Polly client's pool
+VOICE_CACHE_PATH   = os.path.join(OUTPUT_BASE_DIR, "voices.json")  # on-disk describe_voices catalogue
+VOICE_CACHE_TTL    = 24 * 3600      # seconds before the voice catalogue is fetched again
+STREAM_CHUNK_SIZE  = 64 * 1024      # bytes copied per read from each AudioStream
 
 # Long-form limits (room for safety)
 NEURAL_LIMIT  = 1500
@@ -276,8 +284,22 @@ def _assert_aws_creds():
             "and export AWS_PROFILE and AWS_SDK_LOAD_CONFIG before running this script."
         )
 
+_POLLY_CLIENT = None
+_POLLY_CLIENT_LOCK = threading.Lock()
+
 def polly_client():
-    return boto3.client("polly", region_name=POLLY_REGION)
+    """
+    Return the process-wide Polly client, building it on first use.
+    botocore clients are thread-safe, so every worker reuses its warm keep-alive connections
+    instead of paying for credential resolution, endpoint loading and a cold TLS handshake.
+    """
+    global _POLLY_CLIENT
+    if _POLLY_CLIENT is None:
+        with _POLLY_CLIENT_LOCK:
+            if _POLLY_CLIENT is None:
+                cfg = Config(max_pool_connections=POLLY_MAX_POOL, tcp_keepalive=True)
+                _POLLY_CLIENT = boto3.client("polly", region_name=POLLY_REGION, config=cfg)
+    return _POLLY_CLIENT
 
 def ensure_dirs(*paths):
     for p in paths:
@@ -406,7 +428,118 @@ def split_plain_text(text: str, engine: str):
     if buf: parts.append(buf)
     return parts
 
-def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE):
+def _copy_stream(stream, dst, chunk_size=STREAM_CHUNK_SIZE):
+    """Copy a file-like AudioStream into dst in fixed-size chunks; returns the byte count."""
+    total = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return total
+        dst.write(chunk)
+        total += len(chunk)
+
+_UMASK = os.umask(0o022)  # read once at import; os.umask() can only be queried by setting it
+os.umask(_UMASK)
+
+@contextmanager
+def atomic_output(outpath):
+    """
+    Yield a temp file next to outpath and rename it into place only when the block succeeds,
+    so a crash or Ctrl-C never leaves a half-written file at the final path.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(outpath)}.", suffix=".part",
+                               dir=os.path.dirname(outpath) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the mode of the file being replaced, else what open() would give
+        try:
+            mode = os.stat(outpath).st_mode & 0o777
+        except OSError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp, mode)
+        os.replace(tmp, outpath)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def _synthesize_segment(pc, seg, idx, *, text_type, voice, engine, output_format, sample_rate):
+    """
+    Synthesize one segment and return its audio as a spooled temp file positioned at 0.
+    Unsupported-SSML failures walk the fallback ladder for this segment only.
+    """
+    try:
+        resp = pc.synthesize_speech(
+            Text=seg,
+            TextType=text_type,
+            VoiceId=voice,
+            Engine=engine,
+            OutputFormat=output_format,
+            SampleRate=sample_rate
+        )
+    except (BotoCoreError, ClientError) as e:
+        # If neural SSML still fails due to unsupported features, retry with standard
+        msg = str(e)
+        if text_type == "ssml" and engine == "neural" and ("InvalidSsmlException" in msg or "Unsupported Neural" in msg):
+            # First try minimal sanitization to stay on neural
+            minimally_sanitized = sanitize_ssml_for_neural_minimal(seg)
+            try:
+                resp = pc.synthesize_speech(
+                    Text=minimally_sanitized, TextType=text_type, VoiceId=voice, Engine="neural",
+                    OutputFormat=output_format, SampleRate=sample_rate
+                )
+            except (BotoCoreError, ClientError):
+                # Then try standard engine with the original seg. If the voice does not support standard,
+                # fall back to an Indian voice that does support the needed engine.
+                try:
+                    resp = pc.synthesize_speech(
+                        Text=seg, TextType=text_type, VoiceId=voice, Engine="standard",
+                        OutputFormat=output_format, SampleRate=sample_rate
+                    )
+                except (BotoCoreError, ClientError):
+                    # Switch voice/engine and retry once
+                    fallback_voice, fallback_engine = select_indian_voice(preferred_engine="standard")
+                    resp = pc.synthesize_speech(
+                        Text=minimally_sanitized, TextType=text_type, VoiceId=fallback_voice, Engine=fallback_engine,
+                        OutputFormat=output_format, SampleRate=sample_rate
+                    )
+        else:
+            raise RuntimeError(f"synthesize_speech failed for {voice} ({engine}) seg#{idx}: {e}")
+
+    stream = resp.get("AudioStream")
+    if not stream:
+        raise RuntimeError("No AudioStream in response.")
+    # Spool to an anonymous temp file so memory stays flat however long the segment is
+    part = tempfile.TemporaryFile()
+    _copy_stream(stream, part)
+    part.seek(0)
+    return part
+
+def _map_segments(fn, segments, concurrency):
+    """
+    Run fn(idx, seg) over segments with at most `concurrency` calls in flight.
+    Results come back in segment order; the first failure cancels segments not yet started.
+    """
+    items = list(enumerate(segments, 1))
+    workers = max(1, min(concurrency or 1, len(items)))
+    if workers == 1:
+        return [fn(idx, seg) for idx, seg in items]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(fn, idx, seg) for idx, seg in items]
+        try:
+            return [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+
+def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_FORMAT, sample_rate=SAMPLE_RATE,
+               concurrency=SEGMENT_CONCURRENCY):
     pc = polly_client()
 
     # Prepare segments
@@ -422,65 +555,86 @@ def synthesize(text, *, text_type, voice, engine, outpath, output_format=OUTPUT_
     else:
         segments = split_plain_text(text, engine)
 
-    audio_bytes = b""
-    for idx, seg in enumerate(segments, 1):
-        try:
-            resp = pc.synthesize_speech(
-                Text=seg,
-                TextType=text_type,
-                VoiceId=voice,
-                Engine=engine,
-                OutputFormat=output_format,
-                SampleRate=sample_rate
-            )
-        except (BotoCoreError, ClientError) as e:
-            # If neural SSML still fails due to unsupported features, retry with standard
-            msg = str(e)
-            if text_type == "ssml" and engine == "neural" and ("InvalidSsmlException" in msg or "Unsupported Neural" in msg):
-                # First try minimal sanitization to stay on neural
-                minimally_sanitized = sanitize_ssml_for_neural_minimal(seg)
-                try:
-                    resp = pc.synthesize_speech(
-                        Text=minimally_sanitized, TextType=text_type, VoiceId=voice, Engine="neural",
-                        OutputFormat=output_format, SampleRate=sample_rate
-                    )
-                except (BotoCoreError, ClientError):
-                    # Then try standard engine with the original seg. If the voice does not support standard,
-                    # fall back to an Indian voice that does support the needed engine.
-                    try:
-                        resp = pc.synthesize_speech(
-                            Text=seg, TextType=text_type, VoiceId=voice, Engine="standard",
-                            OutputFormat=output_format, SampleRate=sample_rate
-                        )
-                    except (BotoCoreError, ClientError):
-                        # Switch voice/engine and retry once
-                        fallback_voice, fallback_engine = select_indian_voice(preferred_engine="standard")
-                        resp = pc.synthesize_speech(
-                            Text=minimally_sanitized, TextType=text_type, VoiceId=fallback_voice, Engine=fallback_engine,
-                            OutputFormat=output_format, SampleRate=sample_rate
-                        )
-            else:
-                raise RuntimeError(f"synthesize_speech failed for {voice} ({engine}) seg#{idx}: {e}")
+    def _one(idx, seg):
+        return _synthesize_segment(pc, seg, idx, text_type=text_type, voice=voice, engine=engine,
+                                   output_format=output_format, sample_rate=sample_rate)
 
-        stream = resp.get("AudioStream")
-        if not stream:
-            raise RuntimeError("No AudioStream in response.")
-        audio_bytes += stream.read()
-
-    with open(outpath, "wb") as f:
-        f.write(audio_bytes)
+    # Segments are sent concurrently (bounded by `concurrency`) and joined back in original order
+    parts = _map_segments(_one, segments, concurrency)
+    try:
+        with atomic_output(outpath) as out:
+            for part in parts:
+                shutil.copyfileobj(part, out, STREAM_CHUNK_SIZE)
+    finally:
+        for part in parts:
+            part.close()
     print(f"Saved: {outpath}")
 
+class VoiceCatalogue:
+    """
+    Every Polly voice in POLLY_REGION, indexed by voice Id, primary language code and supported engine.
+    """
+    def __init__(self, voices):
+        self.voices = voices
+        self.by_id = {v["Id"]: v for v in voices}
+        self.by_language = {}
+        self.by_engine = {}
+        for v in voices:
+            self.by_language.setdefault(v.get("LanguageCode"), []).append(v)
+            for eng in v.get("SupportedEngines") or []:
+                self.by_engine.setdefault(eng, []).append(v)
+
+    def engines(self, voice_id):
+        return (self.by_id.get(voice_id) or {}).get("SupportedEngines") or []
+
+    def supports(self, voice_id, engine):
+        return engine in self.engines(voice_id)
+
+_VOICE_CATALOGUE = None
+_VOICE_CATALOGUE_LOCK = threading.Lock()
+
+def _load_cached_voices():
+    try:
+        with open(VOICE_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("region") != POLLY_REGION or time.time() - cached.get("fetched_at", 0) > VOICE_CACHE_TTL:
+        return None
+    return cached.get("voices")
+
+def _save_cached_voices(voices):
+    try:
+        ensure_dirs(os.path.dirname(VOICE_CACHE_PATH) or ".")
+        tmp = f"{VOICE_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"region": POLLY_REGION, "fetched_at": time.time(), "voices": voices}, f)
+        os.replace(tmp, VOICE_CACHE_PATH)
+    except OSError as e:
+        print(f"[WARN] Could not cache voice catalogue at {VOICE_CACHE_PATH}: {e}")
+
+def voice_catalogue(refresh=False):
+    """
+    Fetch describe_voices once per process (and once per VOICE_CACHE_TTL on disk).
+    All voice selection and grid planning is answered from this in-memory index.
+    """
+    global _VOICE_CATALOGUE
+    with _VOICE_CATALOGUE_LOCK:
+        if _VOICE_CATALOGUE is None or refresh:
+            voices = None if refresh else _load_cached_voices()
+            if voices is None:
+                voices = []
+                for page in polly_client().get_paginator("describe_voices").paginate():
+                    voices.extend(page.get("Voices", []))
+                _save_cached_voices(voices)
+            _VOICE_CATALOGUE = VoiceCatalogue(voices)
+        return _VOICE_CATALOGUE
+
 def list_voices(language_code=None):
-    pc = polly_client()
-    voices = []
-    paginator = pc.get_paginator("describe_voices")
-    kwargs = {}
+    cat = voice_catalogue()
     if language_code:
-        kwargs["LanguageCode"] = language_code
-    for page in paginator.paginate(**kwargs):
-        voices.extend(page.get("Voices", []))
-    return voices
+        return list(cat.by_language.get(language_code, []))
+    return list(cat.voices)
 
 def select_indian_voice(preferred_engine: str = BASELINE_ENGINE):
     """
@@ -488,25 +642,24 @@ def select_indian_voice(preferred_engine: str = BASELINE_ENGINE):
     Choose the preferred engine if supported, otherwise fall back to any supported engine.
     """
     try:
-        indian_voices = []
-        # Try Indian English and Hindi voices
-        for lang_code in ("en-IN", "hi-IN"):
-            indian_voices.extend(list_voices(language_code=lang_code))
-        # If API does not filter or returns empty, fall back to all voices
+        cat = voice_catalogue()
+        # Indian English and Hindi voices
+        indian_voices = cat.by_language.get("en-IN", []) + cat.by_language.get("hi-IN", [])
+        # If the region has none, fall back to all voices
         if not indian_voices:
-            indian_voices = list_voices()
+            indian_voices = cat.voices
+        indian_ids = {v.get("Id") for v in indian_voices}
 
         preferred_voice_ids = ["Kajal", "Raveena", "Aditi"]
 
         # Try preferred list first
         for voice_id in preferred_voice_ids:
-            for v in indian_voices:
-                if v.get("Id") == voice_id:
-                    engines = v.get("SupportedEngines") or []
-                    if preferred_engine in engines:
-                        return voice_id, preferred_engine
-                    if engines:
-                        return voice_id, engines[0]
+            if voice_id in indian_ids:
+                engines = cat.engines(voice_id)
+                if preferred_engine in engines:
+                    return voice_id, preferred_engine
+                if engines:
+                    return voice_id, engines[0]
 
         # Otherwise, pick any Indian voice
         for v in indian_voices: